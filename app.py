@@ -1,4 +1,9 @@
-from functions import create_all_combos,fetch_and_process_data,create_minion_df,apply_all_combos
+from engine import MISC_UPGRADES
+from bundle import load_structure
+from service import build_table
+from query import SORT_COLUMNS, ResultCache, query_key
+from portfolio import optimize
+from instrument import trace_memory
 
 import streamlit as st
 from streamlit.column_config import NumberColumn
@@ -12,39 +17,55 @@ import math
 import numpy as np
 
 @st.cache_data(ttl=3600)
-def create_final_df():
-    INT32_MAX = 2_147_483_647
-    bazaar_cache = {
-        k: {
-            "Instant Sell": v["quick_status"]["sellPrice"],
-            "Instant Buy": v["quick_status"]["buyPrice"]
-        }
-        for k, v in requests.get("https://api.hypixel.net/v2/skyblock/bazaar").json()['products'].items()
-    }
-    all_combos = create_all_combos(bazaar_cache)
-    
-    minion_dict,minion_info = fetch_and_process_data()
+def create_final_df(craft_costs=False, debug=False):
+    #Memory tracing slows the build, so only debug sessions pay for it
+    table,trace,_ = build_table(craft_costs, trace_memory(default=debug))
+    return table,trace.report(),trace.profiles
+
+@st.cache_resource
+def shared_cache(craft_costs=False, debug=False):
+    #One cache per table variant, so sessions on different variants don't clear each other's results
+    return ResultCache(maxsize=256)
 
-    all_minion_results = []
-    for minion_name,minion_data in minion_dict.items():
-        base_df = create_minion_df(minion_data)
-        combo_df = apply_all_combos(base_df.copy(),all_combos,minion_info[minion_name])
-        combo_df['Minion'] = minion_name
-        combo_df['ROI'] = np.where(combo_df['Profit'] > 0, combo_df['Cost'] / combo_df['Profit'], INT32_MAX)
-        all_minion_results.append(combo_df)
+def session_cache(craft_costs=False, debug=False):
+    return st.session_state.setdefault('result_cache', {}).setdefault((craft_costs, debug), ResultCache(maxsize=32))
 
-    return pd.concat(all_minion_results,ignore_index=True)
+def cached_rows(key, compute):
+    #Looks in this session's cache, then the one shared by every session, before computing
+    return session_cache(craft_costs, debug).get_or_compute(table.generation, key,
+                                                            lambda: shared_cache(craft_costs, debug).get_or_compute(table.generation, key, compute))
 
 st.set_page_config(layout="wide")
 st.title("Skyblock Minion Calculator")
 
-df = create_final_df()
-df['Misc Upgrades'] = pd.Categorical(df['Misc Upgrades'])
+craft_costs = st.session_state.get('craft_costs', False)
+debug = str(st.query_params.get("debug", "")).lower() in {"1", "true", "yes", "on"}
+table,build_report,build_profiles = create_final_df(craft_costs, debug)
+df,effects = table.df,table.effects
 
 new_order = ['Minion','Tier','Fuel','Upgrade 1','Upgrade 2','Misc Upgrades','Profit','Cost','ROI']
-df = df[new_order]
 
-max_craft_cost = float(math.ceil(df['Cost'].max()/1000000))
+structure = load_structure()
+selected_minions = [structure['Minions'].index(name) for name in st.session_state.get('minion_whitelist', [])] or slice(None)
+possible_fuels = dict(zip(structure['Fuels'], structure['Fuel Compatible'][selected_minions].any(axis=0)))
+possible_upgrades = structure['Upgrade Valid'][selected_minions].any(axis=0)
+possible_upgrades = dict(zip(structure['Upgrades'], possible_upgrades.any(axis=0) | possible_upgrades.any(axis=1)))
+
+def mark_impossible(possible):
+    return lambda option: option if possible.get(option, True) else f"{option} (unavailable)"
+
+max_craft_cost = float(math.ceil((df['Cost'].max() + effects['Cost'].max())/1000000))
+
+if debug:
+    with st.sidebar.expander("Build Timings"):
+        st.caption(f"Last build {datetime.fromtimestamp(build_report['Started']):%H:%M:%S}, {build_report['Seconds']:.2f}s")
+        st.dataframe(pd.DataFrame(build_report['Stages']).set_index('Stage'), width="stretch")
+        for name, text in build_profiles.items():
+            st.text(f"{name} profile")
+            st.code(text)
+    with st.sidebar.expander("Result Cache"):
+        cache_stats = {"Session": session_cache(craft_costs, debug).stats(), "Shared": shared_cache(craft_costs, debug).stats()}
+        st.dataframe(pd.DataFrame(cache_stats).T.drop(columns='Generation'), width="stretch")
 
 if 'filters_applied' not in st.session_state:
     st.session_state.filters_applied = True
@@ -52,19 +73,19 @@ if 'filters_applied' not in st.session_state:
 with st.sidebar.form("Filters_Form"):
     st.header("Filter Options")
     
-    minion_whitelist = st.multiselect("Minions Whitelist", options=df['Minion'].unique())
+    minion_whitelist = st.multiselect("Minions Whitelist", options=df['Minion'].unique(), key="minion_whitelist")
     minion_blacklist = st.multiselect("Minions Blacklist", options=df['Minion'].unique())
 
     minion_tier_range = st.slider("Minion Tier Range", min_value=1,max_value=12,value=(1,12),step=1)
 
-    fuel_whitelist = st.multiselect("Fuel Whitelist", options=df['Fuel'].unique())
-    fuel_blacklist = st.multiselect("Fuel Blacklist", options=df['Fuel'].unique())
+    fuel_whitelist = st.multiselect("Fuel Whitelist", options=df['Fuel'].unique(), format_func=mark_impossible(possible_fuels))
+    fuel_blacklist = st.multiselect("Fuel Blacklist", options=df['Fuel'].unique(), format_func=mark_impossible(possible_fuels))
 
     all_upgrades = pd.unique(df[['Upgrade 1', 'Upgrade 2']].values.ravel('K'))
     all_upgrades = sorted([x for x in all_upgrades if pd.notna(x)])
 
-    upgrade_whitelist = st.multiselect("Upgrade Whitelist", options=all_upgrades)
-    upgrade_blacklist = st.multiselect("Upgrade Blacklist", options=all_upgrades)
+    upgrade_whitelist = st.multiselect("Upgrade Whitelist", options=all_upgrades, format_func=mark_impossible(possible_upgrades))
+    upgrade_blacklist = st.multiselect("Upgrade Blacklist", options=all_upgrades, format_func=mark_impossible(possible_upgrades))
 
     col5, col6 = st.columns(2)
     with col5:
@@ -78,54 +99,89 @@ with st.sidebar.form("Filters_Form"):
 
     misc_upgrades = st.multiselect(
         "Miscellaneous Upgrades",
-        ["Floating Crystal", "Beacon", "Power Crystal", "Mithril Infusion", "Free Will", "Postcard"],
+        MISC_UPGRADES,
     )
 
+    st.checkbox("Craft Ingredients When Cheaper", key="craft_costs",
+                help="Price each recipe ingredient at the cheaper of buying it and crafting it from its components")
+
+    view = st.radio("Show", ["All Setups", "Top Setups", "Pareto Frontier", "Portfolio"], horizontal=True,
+                    help="Pareto Frontier keeps setups no cheaper setup matches on profit. Portfolio fills your minion slots "
+                         "within a budget, buying the selected miscellaneous upgrades where they pay off")
+    col7, col8 = st.columns(2)
+    with col7:
+        rank_by = st.selectbox("Rank By", ["Profit", "ROI", "Cost"])
+        minion_slots = st.number_input("Minion Slots", min_value=1, value=25, step=1)
+    with col8:
+        top_n = st.number_input("Top N", min_value=1, value=50, step=1)
+        budget = st.number_input("Budget (M)", min_value=0.0, value=50.0, step=1.0) * 1000000
+
     if st.form_submit_button("Apply Filters"):
         st.session_state.filters_applied = True
 
 if st.session_state.filters_applied:
     st.session_state.filters_applied = False
 
-    target_tuple = tuple(sorted(misc_upgrades))
-    target_cat = pd.Categorical([target_tuple],categories=df['Misc Upgrades'].cat.categories)[0]
-
-    mask = pd.Series(True,index=df.index)
-
-    if minion_tier_range:
-        mask &= df['Tier'].between(*minion_tier_range)
-
-    if minion_whitelist:
-        mask &= df['Minion'].isin(minion_whitelist)
-    if minion_blacklist:
-        mask &= ~df['Minion'].isin(minion_blacklist)
-
-    if fuel_whitelist:
-        mask &= df['Fuel'].isin(fuel_whitelist)
-    if fuel_blacklist:
-        mask &= ~df['Fuel'].isin(fuel_blacklist)
-
-    if upgrade_whitelist:
-        upgrade_whitelist_set = set(upgrade_whitelist)
-        if len(upgrade_whitelist_set) == 1:
-            mask &= df['Upgrade 1'].isin(upgrade_whitelist_set) | df['Upgrade 2'].isin(upgrade_whitelist_set)
-        else:
-            mask &= df['Upgrade 1'].isin(upgrade_whitelist_set) & df['Upgrade 2'].isin(upgrade_whitelist_set)   
-    if upgrade_blacklist:
-        mask &= ~(df['Upgrade 1'].isin(upgrade_blacklist) |df['Upgrade 2'].isin(upgrade_blacklist))
-
-    mask &= (df['Cost'] >= min_cost) & (df['Cost'] <= max_cost)
-    mask &= (df['Misc Upgrades'] == target_cat)
-
-    filtered_df = df[mask].copy().drop('Misc Upgrades', axis=1).reset_index(drop=True)
+    filters = {
+        "minion_whitelist": minion_whitelist,
+        "minion_blacklist": minion_blacklist,
+        "tier_range": minion_tier_range,
+        "fuel_whitelist": fuel_whitelist,
+        "fuel_blacklist": fuel_blacklist,
+        "upgrade_whitelist": upgrade_whitelist,
+        "upgrade_blacklist": upgrade_blacklist,
+        "cost_range": (min_cost, max_cost),
+        "misc_upgrades": () if view == "Portfolio" else misc_upgrades
+    }
+    rows = cached_rows(query_key(**filters), lambda: table.filter(**filters))
+    if view == "Portfolio":
+        st.session_state.results = {"Portfolio": optimize(table, rows, int(minion_slots), budget, misc_upgrades)}
+    else:
+        if view == "Top Setups":
+            rows = cached_rows(query_key(**filters, view="top", by=rank_by, k=top_n),
+                               lambda: table.top_k(rows, int(top_n), rank_by, misc_upgrades))
+        elif view == "Pareto Frontier":
+            rows = cached_rows(query_key(**filters, view="pareto"), lambda: table.pareto(rows, misc_upgrades))
+        st.session_state.results = {"Rows": rows, "Misc Upgrades": misc_upgrades}
+    st.session_state.page = 1
+
+column_config = {
+    "Profit": NumberColumn("Profit", format="%.1fK", help="Daily profit in thousands of coins"),
+    "Cost": NumberColumn("Cost", format="%.2fM", help="Cost to craft this minion setup, in millions"),
+}
+results = st.session_state.get('results', {})
+
+if "Portfolio" in results:
+    portfolio = results['Portfolio']
+    st.caption(f"Daily profit {portfolio['Profit']/1_000:,.1f}K for {portfolio['Cost']/1_000_000:,.2f}M, "
+               f"island upgrades: {', '.join(portfolio['Island Upgrades']) or 'none'}")
+    filtered_df = portfolio['Setups'].copy()
+    filtered_df['Misc Upgrades'] = filtered_df['Misc Upgrades'].map(", ".join)
+    filtered_df['Profit'] = filtered_df['Profit'] / 1_000
+    filtered_df['Cost'] = filtered_df['Cost'] / 1_000_000
+    st.dataframe(filtered_df, column_config=column_config, width="stretch")
+
+elif "Rows" in results:
+    #Only the visible page is sorted into place, evaluated and sent to the browser
+    rows = results['Rows']
+    col9, col10, col11, col12 = st.columns(4)
+    with col9:
+        sort_by = st.selectbox("Sort By", ["Default"] + SORT_COLUMNS,
+                               help="Default keeps the filter order: ranked for Top Setups, cheapest first for Pareto Frontier")
+    with col10:
+        descending = st.toggle("Descending", value=True)
+    with col11:
+        page_size = st.selectbox("Rows Per Page", [50, 100, 250, 500], index=1)
+    n_pages = max(math.ceil(len(rows) / page_size), 1)
+    with col12:
+        page = st.number_input(f"Page (of {n_pages:,})", min_value=1, max_value=n_pages, step=1, key="page")
+
+    page_rows = table.sort_page(rows, None if sort_by == "Default" else sort_by, not descending,
+                                int(page) - 1, page_size, results['Misc Upgrades'])
+    filtered_df = table.evaluate(page_rows, results['Misc Upgrades'])[new_order].drop('Misc Upgrades', axis=1)
+    filtered_df.index = pd.RangeIndex((int(page) - 1) * page_size, (int(page) - 1) * page_size + len(filtered_df))
     filtered_df['Profit'] = filtered_df['Profit'] / 1_000
     filtered_df['Cost'] = filtered_df['Cost'] / 1_000_000
 
-    st.dataframe(
-        filtered_df,
-        column_config={
-            "Profit": NumberColumn("Profit", format="%.1fK", help="Daily profit in thousands of coins"),
-            "Cost": NumberColumn("Cost", format="%.2fM", help="Cost to craft this minion setup, in millions"),
-        },
-        width="stretch"
-    )
\ No newline at end of file
+    st.caption(f"{len(rows):,} setups")
+    st.dataframe(filtered_df, column_config=column_config, width="stretch")
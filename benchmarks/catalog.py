@@ -0,0 +1,121 @@
+import os
+import json
+import random
+
+from functions import load_data
+from engine import catalog_items, MISC_ITEMS
+
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "prices.json")
+CATALOGS = ["Minions", "Fuels", "Upgrades"]
+
+def synthetic_prices(items, seed=0):
+    """
+    Generates deterministic bazaar prices, with every instant buy at or above its instant sell.
+
+    Args:
+        items (Iterable): Item IDs to price.
+        seed (int): Random seed.
+
+    Returns:
+        Dict: A bazaar cache mapping item IDs to their 'Instant Sell' and 'Instant Buy' prices.
+    """
+    rng = random.Random(seed)
+    prices = {}
+    for item in sorted(items):
+        sell = round(10 ** rng.uniform(0, 5), 1)
+        prices[item] = {
+            "Instant Sell": sell,
+            "Instant Buy": round(sell * rng.uniform(1, 1.3), 1)
+        }
+    return prices
+
+def freeze_fixture(path=FIXTURE_PATH, seed=0):
+    """
+    Writes the price fixture for every item the data files reference, plus the misc upgrade items.
+
+    Args:
+        path (str): Where to write the fixture.
+        seed (int): Random seed.
+    """
+    items = catalog_items(*load_data()) + MISC_ITEMS
+    fixture = {
+        "Bazaar": synthetic_prices(items, seed),
+        "Postcard": 1_250_000
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as file:
+        json.dump(fixture, file, indent=1, sort_keys=True)
+
+def load_fixture(path=FIXTURE_PATH):
+    """
+    Loads the frozen price fixture.
+
+    Returns:
+        Tuple of the bazaar cache and the Postcard cost.
+    """
+    with open(path, "r") as file:
+        fixture = json.load(file)
+    return fixture['Bazaar'], fixture['Postcard']
+
+def _copy_name(name, k):
+    return name if k == 0 else f"{name} #{k + 1}"
+
+def _copy_id(item_id, k):
+    return item_id if k == 0 else f"{item_id}_{k + 1}"
+
+def scale_catalog(minions, fuels, upgrades, bazaar_cache, minion_scale=1, fuel_scale=1, upgrade_scale=1):
+    """
+    Grows the minion, fuel and upgrade catalogs by whole copies of themselves.
+
+    Copies get numbered names and IDs and the prices of their originals, so every copy produces the same
+    setups as its original, except that upgrades conditioned on a minion's name only fit the original.
+    The Super Compactor is never copied, since setups recognise it by name; it stays incompatible with
+    every copy of its incompatible upgrades, while other incompatibilities stay within a copy.
+
+    Combinations grow with the fuels times the square of the upgrades, so fuel and upgrade scales multiply
+    the row count much faster than minion scales.
+
+    The misc upgrade catalog can't be scaled this way: create_all_combos enumerates every subset of it,
+    so ten times the upgrades would mean 2^60 combos.
+
+    Args:
+        minions (Dict): The raw minion dictionaries.
+        fuels (Dict): The raw fuel dictionaries.
+        upgrades (Dict): The raw upgrade dictionaries.
+        bazaar_cache (Dict): Prices for the original catalogs.
+        minion_scale, fuel_scale, upgrade_scale (int): Number of copies of each catalog.
+
+    Returns:
+        Tuple of the scaled minion, fuel and upgrade dictionaries and the extended bazaar cache.
+    """
+    bazaar_cache = dict(bazaar_cache)
+
+    scaled_minions = {}
+    for k in range(minion_scale):
+        for name, minion in minions.items():
+            scaled_minions[_copy_name(name, k)] = {**minion, "Name": _copy_name(minion['Name'], k)}
+
+    scaled_fuels = {}
+    for k in range(fuel_scale):
+        for fuel_id, fuel in fuels.items():
+            scaled_fuels[_copy_id(fuel_id, k)] = {**fuel, "Name": _copy_name(fuel['Name'], k)}
+            if fuel_id in bazaar_cache:
+                bazaar_cache[_copy_id(fuel_id, k)] = bazaar_cache[fuel_id]
+
+    scaled_upgrades = {}
+    for k in range(upgrade_scale):
+        for upgrade_id, upgrade in upgrades.items():
+            if k and upgrade['Name'] == "Super Compactor":
+                continue
+            copy = {**upgrade, "Name": _copy_name(upgrade['Name'], k)}
+            if 'Incompatible' in upgrade:
+                copies = range(upgrade_scale) if upgrade['Name'] == "Super Compactor" else [k]
+                copy['Incompatible'] = [_copy_id(other, j) for other in upgrade['Incompatible'] for j in copies]
+            scaled_upgrades[_copy_id(upgrade_id, k)] = copy
+            if upgrade_id in bazaar_cache:
+                bazaar_cache[_copy_id(upgrade_id, k)] = bazaar_cache[upgrade_id]
+
+    return scaled_minions, scaled_fuels, scaled_upgrades, bazaar_cache
+
+if __name__ == "__main__":
+    freeze_fixture()
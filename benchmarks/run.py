@@ -0,0 +1,303 @@
+"""
+Offline benchmarks for the build pipeline, run from the repository root:
+
+    python -m benchmarks.run --scales 1 10 100 --baseline benchmarks/baseline.json
+
+Prices come from the frozen fixture in benchmarks/fixtures, so runs are repeatable and need no network.
+Results are written as JSON and compared against a baseline from the same machine; the exit code is 1
+when a benchmark regressed.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+from functions import load_data, fetch_and_process_data, create_all_combos, create_minion_df, apply_all_combos, minion_metadata
+from engine import build_structure, reprice, add_misc_flags, combo_effects, build_combo_frame
+from query import SetupTable
+from benchmarks.catalog import CATALOGS, load_fixture, scale_catalog
+
+RESULTS_PATH = os.path.join(".cache", "benchmarks.json")
+BASELINE_PATH = os.path.join("benchmarks", "baseline.json")
+
+class Context:
+    """
+    The scaled catalogs for one benchmark scale, with the inputs later stages share built on first use.
+
+    Args:
+        scale (int): Number of copies of each scaled catalog.
+        catalogs (Iterable): Which of CATALOGS to scale.
+        workers (int): Worker processes for the stages that can use a pool.
+    """
+    def __init__(self, scale, catalogs, workers=1):
+        self.workers = workers
+        bazaar_cache, self.postcard_cost = load_fixture()
+        scales = {catalog: scale if catalog in catalogs else 1 for catalog in CATALOGS}
+        self.minions, self.fuels, self.upgrades, self.bazaar_cache = scale_catalog(
+            *load_data(), bazaar_cache, scales['Minions'], scales['Fuels'], scales['Upgrades']
+        )
+        self._shared = {}
+
+    def shared(self, name, build):
+        """Returns a shared input, building it on first use."""
+        if name not in self._shared:
+            self._shared[name] = build()
+        return self._shared[name]
+
+    @property
+    def data(self):
+        return self.minions, self.fuels, self.upgrades
+
+    def all_combos(self):
+        return self.shared("All Combos", lambda: create_all_combos(self.bazaar_cache, self.postcard_cost))
+
+    def minion_dict(self):
+        return self.shared("Minion Dict", lambda: fetch_and_process_data(bazaar_cache=self.bazaar_cache, data=self.data, workers=self.workers))
+
+    def minion_frames(self):
+        return self.shared("Minion Frames", lambda: {name: create_minion_df(setups) for name, setups in self.minion_dict()[0].items()})
+
+    def structure(self):
+        return self.shared("Structure", lambda: build_structure(*self.data))
+
+    def table(self):
+        def build():
+            structure = self.structure()
+            base_df = add_misc_flags(reprice(structure, self.bazaar_cache), structure['Minion Info'])
+            return SetupTable(base_df, combo_effects(self.all_combos()))
+        return self.shared("Table", build)
+
+def bench_create_all_combos(context):
+    return lambda: create_all_combos(context.bazaar_cache, context.postcard_cost), len
+
+def bench_fetch_and_process_data(context):
+    run = lambda: fetch_and_process_data(bazaar_cache=context.bazaar_cache, data=context.data, workers=context.workers)
+    return run, lambda result: sum(len(setups) for setups in result[0].values())
+
+def bench_create_minion_df(context):
+    minion_dict = context.minion_dict()[0]
+    run = lambda: [create_minion_df(setups) for setups in minion_dict.values()]
+    return run, lambda frames: sum(len(frame) for frame in frames)
+
+def bench_apply_all_combos(context):
+    #Applied one minion at a time and dropped, so the run doesn't hold every combo in memory at once
+    frames = context.minion_frames()
+    all_combos = context.all_combos()
+    minion_info = minion_metadata(context.minions)
+    run = lambda: sum(len(apply_all_combos(frame, all_combos, minion_info[name])) for name, frame in frames.items())
+    return run, lambda rows: rows
+
+def bench_build_combo_frame(context):
+    minion_dict, minion_info = context.minion_dict()
+    return lambda: build_combo_frame(minion_dict, context.all_combos(), minion_info, context.workers), len
+
+def bench_build_structure(context):
+    return lambda: build_structure(*context.data), lambda structure: len(structure['Rows']['Combo'])
+
+def bench_reprice(context):
+    structure = context.structure()
+    return lambda: reprice(structure, context.bazaar_cache), len
+
+def bench_setup_table(context):
+    structure = context.structure()
+    base_df = add_misc_flags(reprice(structure, context.bazaar_cache), structure['Minion Info'])
+    effects = combo_effects(context.all_combos())
+    return lambda: SetupTable(base_df, effects), len
+
+def bench_filter(context):
+    #The sidebar's defaults with two misc upgrades and a blacklisted fuel, as after a typical first apply
+    table = context.table()
+    criteria = {
+        "tier_range": (1, 12),
+        "fuel_blacklist": ["Foul Flesh"],
+        "cost_range": (0, float(table.df['Cost'].max())),
+        "misc_upgrades": ["Floating Crystal", "Beacon"]
+    }
+    return lambda: table.filter(**criteria), len
+
+#Name: (setup, largest scale it is run at)
+BENCHMARKS = {
+    "create_all_combos": (bench_create_all_combos, None),
+    "fetch_and_process_data": (bench_fetch_and_process_data, 10),
+    "create_minion_df": (bench_create_minion_df, 10),
+    "apply_all_combos": (bench_apply_all_combos, 1),
+    "build_combo_frame": (bench_build_combo_frame, 1),
+    "build_structure": (bench_build_structure, None),
+    "reprice": (bench_reprice, None),
+    "setup_table": (bench_setup_table, None),
+    "filter": (bench_filter, None)
+}
+
+def measure(run, count, repeat=5, budget=10, memory=True):
+    """
+    Times a benchmark and measures its peak memory in a separate traced run.
+
+    Args:
+        run (Callable): The benchmark body.
+        count (Callable): Returns the rows produced from run's result.
+        repeat (int): Most timed runs.
+        budget (float): Stop repeating once the timed runs took this many seconds; at least one run is timed.
+        memory (bool): Also measure peak memory with tracemalloc, which is slower.
+
+    Returns:
+        Dict: 'Rows', 'Runs', 'Median Seconds', 'Min Seconds', 'Rows per Second' and 'Peak MB'.
+    """
+    seconds = []
+    while len(seconds) < repeat and (not seconds or sum(seconds) < budget):
+        start = time.perf_counter()
+        result = run()
+        seconds.append(time.perf_counter() - start)
+    rows = count(result)
+    del result
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            run()
+            peak = tracemalloc.get_traced_memory()[1] / 1e6
+        finally:
+            tracemalloc.stop()
+
+    median = statistics.median(seconds)
+    return {
+        "Rows": int(rows),
+        "Runs": len(seconds),
+        "Median Seconds": median,
+        "Min Seconds": min(seconds),
+        "Rows per Second": rows / median if median else None,
+        "Peak MB": peak
+    }
+
+def run_benchmarks(scales=(1, 10, 100), catalogs=("Minions",), names=None, repeat=5, budget=10, memory=True, workers=1, log=print):
+    """
+    Runs the benchmarks at each scale.
+
+    Args:
+        scales (Iterable): Catalog scales.
+        catalogs (Iterable): Which of CATALOGS the scale applies to.
+        names (Iterable, optional): Benchmarks to run. Defaults to all of BENCHMARKS.
+        repeat, budget, memory: See measure.
+        workers (int): Worker processes for fetch_and_process_data and build_combo_frame, see resolve_workers.
+        log (Callable): Receives a progress line per benchmark.
+
+    Returns:
+        Dict: 'Machine' and 'Results', mapping each benchmark to its measure results by scale.
+    """
+    results = {}
+    for scale in scales:
+        context = Context(scale, catalogs, workers)
+        for name in names or BENCHMARKS:
+            setup, max_scale = BENCHMARKS[name]
+            if max_scale is not None and scale > max_scale:
+                continue
+            run, count = setup(context)
+            result = measure(run, count, repeat, budget, memory)
+            results.setdefault(name, {})[str(scale)] = result
+            log(f"{name:>24} {scale:>4}x {result['Median Seconds'] * 1e3:>11.2f} ms {result['Rows']:>11,} rows"
+                + (f" {result['Peak MB']:>9.1f} MB" if result['Peak MB'] is not None else ""))
+    return {
+        "Machine": {
+            "Platform": platform.platform(),
+            "Python": platform.python_version(),
+            "NumPy": np.__version__,
+            "Pandas": pd.__version__,
+            "CPUs": os.cpu_count()
+        },
+        "Catalogs": list(catalogs),
+        "Workers": workers,
+        "Created": time.time(),
+        "Results": results
+    }
+
+def compare(results, baseline, tolerance=0.25, min_seconds=1e-3, min_mb=1):
+    """
+    Compares results against a baseline run.
+
+    A benchmark regressed if its median time or peak memory grew by more than the tolerance and by more
+    than the noise floor.
+
+    Args:
+        results (Dict): From run_benchmarks.
+        baseline (Dict): An earlier run_benchmarks result.
+        tolerance (float): Allowed relative growth.
+        min_seconds (float): Time differences below this are ignored.
+        min_mb (float): Memory differences below this are ignored.
+
+    Returns:
+        list: A Dict per benchmark and scale present in both, with 'Benchmark', 'Scale', 'Time Ratio',
+            'Memory Ratio' and 'Regressed'.
+    """
+    rows = []
+    for name, scales in results['Results'].items():
+        for scale, result in scales.items():
+            old = baseline['Results'].get(name, {}).get(scale)
+            if old is None:
+                continue
+            time_ratio = result['Median Seconds'] / old['Median Seconds'] if old['Median Seconds'] else None
+            slower = time_ratio is not None and time_ratio > 1 + tolerance and result['Median Seconds'] - old['Median Seconds'] > min_seconds
+            memory_ratio = None
+            larger = False
+            if result['Peak MB'] is not None and old['Peak MB']:
+                memory_ratio = result['Peak MB'] / old['Peak MB']
+                larger = memory_ratio > 1 + tolerance and result['Peak MB'] - old['Peak MB'] > min_mb
+            rows.append({
+                "Benchmark": name,
+                "Scale": scale,
+                "Time Ratio": time_ratio,
+                "Memory Ratio": memory_ratio,
+                "Regressed": slower or larger
+            })
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks the minion calculator pipeline offline.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--catalogs", nargs="+", default=["Minions"], choices=CATALOGS)
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=10)
+    parser.add_argument("--no-memory", action="store_true")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes; 0 for one per CPU.")
+    parser.add_argument("--out", default=RESULTS_PATH)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline.")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.scales, args.catalogs, args.only, args.repeat, args.budget, not args.no_memory, args.workers)
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w") as file:
+        json.dump(results, file, indent=1)
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(results, file, indent=1)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one.")
+        return 0
+    with open(args.baseline, "r") as file:
+        baseline = json.load(file)
+    if (baseline.get('Catalogs'), baseline.get('Workers', 1)) != (results['Catalogs'], results['Workers']):
+        print(f"Baseline scales {baseline.get('Catalogs')} with {baseline.get('Workers', 1)} workers, not "
+              f"{results['Catalogs']} with {results['Workers']}; nothing to compare.")
+        return 0
+
+    regressed = False
+    for row in compare(results, baseline, args.tolerance):
+        time_ratio = f"{row['Time Ratio']:.2f}x" if row['Time Ratio'] is not None else "-"
+        memory_ratio = f"{row['Memory Ratio']:.2f}x" if row['Memory Ratio'] is not None else "-"
+        print(f"{row['Benchmark']:>24} {row['Scale']:>4}x time {time_ratio:>7} memory {memory_ratio:>7}"
+              + ("  REGRESSED" if row['Regressed'] else ""))
+        regressed |= row['Regressed']
+    return 1 if regressed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import functools
+import numpy as np
+import pandas as pd
+
+from functions import load_data
+from engine import build_structure
+
+BUNDLE_VERSION = 3
+BUNDLE_DIR = os.path.join(".cache", "bundle")
+DATA_FILES = ["_data.json", "_fuels.json", "_upgrades.json"]
+
+def source_hash(paths=DATA_FILES):
+    """
+    Hashes the raw data files and the bundle layout version, without parsing the JSON.
+
+    Args:
+        paths (list): The data files the structure is built from.
+
+    Returns:
+        str: A hex digest identifying the bundle these files compile to.
+    """
+    digest = hashlib.sha256(str(BUNDLE_VERSION).encode())
+    for path in paths:
+        with open(path, "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()[:16]
+
+def save_bundle(structure, path):
+    """
+    Writes a structure as one .npy file per array plus a JSON header for names and metadata.
+
+    Args:
+        structure (Dict): The structure from build_structure.
+        path (str): The bundle directory. It is written to a unique temporary directory beside it and renamed
+            into place, so concurrent writers never share files. If another writer finished first, its bundle
+            is kept and this one is dropped.
+    """
+    parent = os.path.dirname(path) or "."
+    os.makedirs(parent, exist_ok=True)
+    temp_path = tempfile.mkdtemp(prefix="tmp", dir=parent)
+
+    header = {"Arrays": [], "Categories": {}}
+    def write(prefix, value):
+        if isinstance(value, np.ndarray):
+            name = "/".join(prefix)
+            np.save(os.path.join(temp_path, f"{len(header['Arrays'])}.npy"), value)
+            header['Arrays'].append(name)
+        elif isinstance(value, pd.DataFrame):
+            for column in value:
+                header['Categories']["/".join(prefix + [column])] = list(value[column].cat.categories)
+                write(prefix + [column], value[column].cat.codes.to_numpy())
+        elif isinstance(value, dict) and prefix != ["Minion Info"]:
+            for key, item in value.items():
+                write(prefix + [key], item)
+        else:
+            header["/".join(prefix)] = value
+    for key, value in structure.items():
+        write([key], value)
+
+    with open(os.path.join(temp_path, "header.json"), "w") as file:
+        json.dump(header, file)
+    if os.path.exists(os.path.join(path, "header.json")):
+        shutil.rmtree(temp_path, ignore_errors=True)
+        return
+    try:
+        os.replace(temp_path, path)
+    except OSError:
+        shutil.rmtree(temp_path, ignore_errors=True)
+        #Renaming fails when another writer's bundle landed first
+        if not os.path.exists(os.path.join(path, "header.json")):
+            raise
+
+def load_bundle(path):
+    """
+    Memory-maps a bundle written by save_bundle back into a structure.
+
+    Args:
+        path (str): The bundle directory.
+
+    Returns:
+        Dict: The structure, with read-only memory-mapped arrays.
+    """
+    with open(os.path.join(path, "header.json"), "r") as file:
+        header = json.load(file)
+
+    structure = {}
+    dtypes = {}
+    def place(name, value):
+        *parents, leaf = name.split("/")
+        node = structure
+        for parent in parents:
+            node = node.setdefault(parent, {})
+        node[leaf] = value
+
+    for i, name in enumerate(header.pop('Arrays')):
+        array = np.load(os.path.join(path, f"{i}.npy"), mmap_mode='r')
+        categories = header['Categories'].get(name)
+        if categories is None:
+            place(name, array)
+        else:
+            dtype = dtypes.setdefault(tuple(categories), pd.CategoricalDtype(categories))
+            place(name, pd.Categorical.from_codes(array, dtype=dtype))
+    header.pop('Categories')
+    for name, value in header.items():
+        place(name, value)
+
+    structure['Labels'] = pd.DataFrame(structure['Labels'])
+    return structure
+
+def load_or_build(bundle_dir=BUNDLE_DIR):
+    """
+    Loads the bundle matching the current data files, compiling it first if the data files changed.
+
+    Args:
+        bundle_dir (str): Directory holding bundles, one subdirectory per source hash. Bundles for other
+            hashes are removed once the current one is written.
+
+    Returns:
+        Dict: The structure.
+    """
+    name = source_hash()
+    path = os.path.join(bundle_dir, name)
+    if not os.path.exists(os.path.join(path, "header.json")):
+        save_bundle(build_structure(*load_data()), path)
+        #Only complete bundles are pruned; temporary directories may belong to a writer still running
+        for old in os.listdir(bundle_dir):
+            temporary = old.startswith("tmp") or old.endswith(".tmp")
+            if old != name and not temporary and os.path.exists(os.path.join(bundle_dir, old, "header.json")):
+                shutil.rmtree(os.path.join(bundle_dir, old), ignore_errors=True)
+    return load_bundle(path)
+
+@functools.lru_cache(maxsize=1)
+def load_structure():
+    """
+    Returns the coefficient structure once per process, memory-mapped from the compiled bundle.
+
+    Returns:
+        Dict: The structure from build_structure. Callers must not modify it.
+    """
+    return load_or_build()
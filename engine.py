@@ -0,0 +1,966 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from functions import compatibility_matrices, minion_processing, create_minion_df, minion_metadata, apply_all_combos, create_all_combos, resolve_workers, split_chunks
+
+INT32_MAX = 2_147_483_647
+MISC_UPGRADES = ["Floating Crystal", "Beacon", "Power Crystal", "Mithril Infusion", "Free Will", "Postcard"]
+MISC_ITEMS = ["PLASMA", "REFINED_MITHRIL", "STARFALL", "SCORCHED_POWER_CRYSTAL", "MITHRIL_INFUSION", "FREE_WILL"]
+COMPACT_DTYPES = {
+    "Speed Mod": np.float32,
+    "Tier": np.int8,
+    "Speed": np.float32,
+    "CPA": np.float32,
+    "Flat": np.float32,
+    "Cost": np.float64, #Craft costs reach billions and are rounded to 0.1, beyond float32 precision
+    "Daily Cost": np.float32
+}
+
+def _pad_drops(drop_lists, item_index):
+    """
+    Packs a list of drop lists into padded 2D arrays, one row per owner.
+
+    Args:
+        drop_lists (list): One list of drop dictionaries per minion or upgrade.
+        item_index (Dict): Maps item IDs to their column in the price vectors.
+
+    Returns:
+        Dict: 'Amount', 'Chance', 'NPC Price', 'Craft', 'Cooldown' and 'Item' arrays of shape (owners, max drops).
+            Padding slots have an Amount of 0 and a Craft of 1 so they contribute nothing.
+    """
+    width = max([len(drops) for drops in drop_lists] + [1])
+    shape = (len(drop_lists), width)
+    table = {
+        "Amount": np.zeros(shape),
+        "Chance": np.zeros(shape),
+        "NPC Price": np.zeros(shape),
+        "Craft": np.ones(shape),
+        "Cooldown": np.zeros(shape),
+        "Item": np.zeros(shape, dtype=np.int64)
+    }
+    for i, drops in enumerate(drop_lists):
+        for j, drop in enumerate(drops):
+            enchanted_id, enchanted_craft = next(iter(drop['Enchanted'].items()))
+            table['Amount'][i, j] = drop['Amount']
+            table['Chance'][i, j] = drop['Chance']
+            table['NPC Price'][i, j] = drop['NPC Price']
+            table['Craft'][i, j] = enchanted_craft
+            table['Cooldown'][i, j] = drop.get('Cooldown', 0)
+            table['Item'][i, j] = item_index[enchanted_id]
+    return table
+
+def _pad_recipes(recipe_lists, item_index):
+    """
+    Packs a list of price-weighted item lists into padded 2D arrays, one row per owner.
+
+    Args:
+        recipe_lists (list): One list of (item ID, quantity) pairs per owner. The item ID "Coins" is a constant.
+        item_index (Dict): Maps item IDs to their column in the price vectors.
+
+    Returns:
+        Dict: 'Item' and 'Amount' arrays of shape (owners, max items) and a 'Coins' array of shape (owners,).
+    """
+    width = max([len(recipe) for recipe in recipe_lists] + [1])
+    shape = (len(recipe_lists), width)
+    table = {
+        "Item": np.zeros(shape, dtype=np.int64),
+        "Amount": np.zeros(shape),
+        "Coins": np.zeros(len(recipe_lists))
+    }
+    for i, recipe in enumerate(recipe_lists):
+        for j, (item, amount) in enumerate(recipe):
+            if item == "Coins":
+                table['Coins'][i] += amount
+            else:
+                table['Item'][i, j] = item_index[item]
+                table['Amount'][i, j] = amount
+    return table
+
+def _fuel_recipe(name, fuel):
+    """
+    Lists the priced items that make up a fuel's 'Cost' and 'Daily Cost', mirroring price_data.
+
+    Args:
+        name (str): The fuel's item ID.
+        fuel (Dict): The raw fuel dictionary.
+
+    Returns:
+        Tuple of two lists of (item ID, quantity) pairs: the cost recipe and the daily cost recipe.
+    """
+    daily = [] if fuel['Duration'] == -1 else [(name, 86400 / fuel['Duration'])]
+    if fuel.get('Recipe'):
+        return [(item['Item'], item['Amount']) for item in fuel['Recipe']], daily
+    return [(name, 1)] if fuel['Duration'] == -1 else daily, daily
+
+def catalog_items(minions, fuels, upgrades):
+    """
+    Lists every item ID whose bazaar price can affect a result.
+
+    Args:
+        minions (Dict): The raw minion dictionaries.
+        fuels (Dict): The raw fuel dictionaries.
+        upgrades (Dict): The raw upgrade dictionaries.
+
+    Returns:
+        list: Sorted item IDs.
+    """
+    items = set(fuels) | set(upgrades)
+    for minion in minions.values():
+        for tier in minion['Tiers']:
+            items.update(item['Item'] for item in tier.get('Recipe', []))
+    for owner in list(minions.values()) + list(upgrades.values()):
+        for drop in owner.get('Drops', []):
+            items.update(drop['Enchanted'])
+    for fuel in fuels.values():
+        items.update(item['Item'] for item in fuel.get('Recipe', []))
+    items.discard("Coins")
+    return sorted(items)
+
+def compile_tables(minions, fuels, upgrades):
+    """
+    Packs the raw minion, fuel and upgrade dictionaries into price-independent array tables.
+
+    Args:
+        minions (Dict): The raw minion dictionaries.
+        fuels (Dict): The raw fuel dictionaries.
+        upgrades (Dict): The raw upgrade dictionaries.
+
+    Returns:
+        Dict: Name lists, per-entity property arrays and padded drop, recipe and tier tables.
+    """
+    items = catalog_items(minions, fuels, upgrades)
+    item_index = {item: i for i, item in enumerate(items)}
+
+    minion_list = list(minions.values())
+    fuel_list = list(fuels.values())
+    upgrade_keys = list(upgrades)
+    upgrade_list = list(upgrades.values())
+
+    max_tiers = max(len(minion['Tiers']) for minion in minion_list)
+    tier_shape = (len(minion_list), max_tiers)
+    tiers = {
+        "Count": np.array([len(minion['Tiers']) for minion in minion_list]),
+        "Tier": np.zeros(tier_shape, dtype=np.int64),
+        "Speed": np.zeros(tier_shape)
+    }
+    tier_recipes = []
+    for i, minion in enumerate(minion_list):
+        for j in range(max_tiers):
+            tier = minion['Tiers'][j] if j < len(minion['Tiers']) else {}
+            tiers['Tier'][i, j] = tier.get('Tier', 0)
+            tiers['Speed'][i, j] = tier.get('Speed', 0)
+            tier_recipes.append([(item['Item'], item['Amount']) for item in tier.get('Recipe', [])])
+    tiers['Recipe'] = _pad_recipes(tier_recipes, item_index)
+
+    fuel_recipes = [_fuel_recipe(name, fuel) for name, fuel in fuels.items()]
+    compatible = compatibility_matrices(minions, fuels, upgrades)
+
+    return {
+        "Items": items,
+        "Minions": [minion['Name'] for minion in minion_list],
+        "Fuels": [fuel['Name'] for fuel in fuel_list],
+        "Upgrades": [upgrade['Name'] for upgrade in upgrade_list],
+        "Minion Info": minion_metadata(minions),
+        "Fuel Compatible": compatible['Fuel'],
+        "Upgrade Valid": compatible['Upgrade'],
+        "Fuel Speed": np.array([fuel.get('Speed', 0) for fuel in fuel_list], dtype=float),
+        "Fuel Drops": np.array([fuel.get('Drops', 1) for fuel in fuel_list], dtype=float),
+        "Fuel Cost": _pad_recipes([cost for cost, daily in fuel_recipes], item_index),
+        "Fuel Daily Cost": _pad_recipes([daily for cost, daily in fuel_recipes], item_index),
+        "Upgrade Speed": np.array([upgrade.get('Speed', 0) for upgrade in upgrade_list], dtype=float),
+        "Upgrade Chance": np.array([upgrade.get('Chance', 1) for upgrade in upgrade_list], dtype=float),
+        "Upgrade Cost": _pad_recipes([[(key, 1)] for key in upgrade_keys], item_index),
+        "Compactor": np.array([upgrade.get('Name') == "Super Compactor" for upgrade in upgrade_list], dtype=bool),
+        "Minion Drops": _pad_drops([minion['Drops'] for minion in minion_list], item_index),
+        "Upgrade Drops": _pad_drops([upgrade.get('Drops', []) for upgrade in upgrade_list], item_index),
+        "Tiers": tiers
+    }
+
+def enumerate_combinations(tables):
+    """
+    Lists every valid (minion, fuel, upgrade 1, upgrade 2) combination as index arrays.
+
+    Combinations are looked up in the compiled compatibility tables and returned in the order
+    minion_processing produces them.
+
+    Args:
+        tables (Dict): Array tables from compile_tables.
+
+    Returns:
+        Tuple of four int arrays: minion, fuel, upgrade 1 and upgrade 2 indices.
+    """
+    valid = tables['Fuel Compatible'][:, :, None, None] & tables['Upgrade Valid'][:, None, :, :]
+    return np.nonzero(valid)
+
+def _sparse(n_rows, parts, const=None):
+    """
+    Assembles a coefficient matrix in coordinate form from (row, item, value) parts.
+
+    Zero coefficients are dropped. Entries keep the order of the parts, so each row accumulates
+    its terms in the same order as the dict-based engine.
+
+    Args:
+        n_rows (int): Number of matrix rows.
+        parts (list): (row, item, value) array triples; 2D arrays are flattened row-major.
+        const (np.ndarray, optional): Price-independent term of each row.
+
+    Returns:
+        Dict: 'Row', 'Col' and 'Value' entry arrays and a 'Const' array of shape (n_rows,).
+    """
+    row = np.concatenate([np.broadcast_to(r, np.shape(v)).ravel() for r, c, v in parts])
+    col = np.concatenate([np.broadcast_to(c, np.shape(v)).ravel() for r, c, v in parts])
+    value = np.concatenate([np.ravel(v) for r, c, v in parts])
+    keep = value != 0
+    return {
+        "Row": row[keep],
+        "Col": col[keep],
+        "Value": value[keep],
+        "Const": np.zeros(n_rows) if const is None else const
+    }
+
+def _draws(n_rows, parts):
+    """
+    Assembles the random drops behind CPA, one entry per (row, drop) with a nonzero chance and value.
+
+    Args:
+        n_rows (int): Number of matrix rows.
+        parts (list): (row, item, chance, expected value) array quadruples, broadcast as in _sparse; the item is -1
+            where the value is in coins rather than per unit of the item's Instant Buy price.
+
+    Returns:
+        Dict: A coefficient matrix as from _sparse whose 'Value' is what one successful action yields, plus
+            the per-action 'Chance' of success, capped at 1. Chance times Value gives back the expected value.
+    """
+    possible = [(r, c, np.where(p > 0, v, 0)) for r, c, p, v in parts]
+    matrix = _sparse(n_rows, possible)
+    chance = np.concatenate([np.broadcast_to(p, np.shape(v)).ravel() for r, c, p, v in parts])
+    value = np.concatenate([np.ravel(v) for r, c, v in possible])
+    chance = np.minimum(chance[value != 0], 1)
+    matrix['Chance'] = chance
+    matrix['Value'] = matrix['Value'] / chance
+    return matrix
+
+def sparse_dot(matrix, prices):
+    """
+    Multiplies a coefficient matrix by a price vector.
+
+    Args:
+        matrix (Dict): A coefficient matrix from build_structure.
+        prices (np.ndarray): One price per item ID.
+
+    Returns:
+        np.ndarray: The value of each matrix row.
+    """
+    return matrix['Const'] + np.bincount(matrix['Row'], weights=matrix['Value'] * prices[matrix['Col']], minlength=len(matrix['Const']))
+
+def dense_rows(matrix, rows, n_items):
+    """
+    Converts the given rows of a coefficient matrix into a dense (items, rows) block, so a stack of price
+    vectors can be priced with one matrix product.
+
+    Args:
+        matrix (Dict): A coefficient matrix from build_structure.
+        rows (np.ndarray): Unique matrix rows to keep.
+        n_items (int): Number of item IDs.
+
+    Returns:
+        Tuple of the dense coefficients and the constant term of each kept row.
+    """
+    position = np.full(len(matrix['Const']), -1)
+    position[rows] = np.arange(len(rows))
+    entry = position[matrix['Row']] >= 0
+    dense = np.zeros((n_items, len(rows)))
+    np.add.at(dense, (matrix['Col'][entry], position[matrix['Row'][entry]]), matrix['Value'][entry])
+    return dense, matrix['Const'][rows]
+
+def build_structure(minions, fuels, upgrades):
+    """
+    Compiles the catalog into price-independent coefficient matrices over bazaar item IDs.
+
+    CPA and Flat are linear in Instant Buy prices, tier, fuel and upgrade costs are linear in Instant Sell prices,
+    so a bazaar refresh only needs reprice. CPA, Flat, Daily Cost and Upgrade Cost rows are (minion, fuel,
+    upgrade 1, upgrade 2) combinations; Tier Cost rows are (minion, tier) slots.
+
+    Args:
+        minions (Dict): The raw minion dictionaries.
+        fuels (Dict): The raw fuel dictionaries.
+        upgrades (Dict): The raw upgrade dictionaries.
+
+    Returns:
+        Dict: Name lists, combination and row index arrays, the categorical row label frame and the coefficient matrices.
+            Both upgrade label columns share one category dictionary.
+    """
+    tables = compile_tables(minions, fuels, upgrades)
+    m, f, u1, u2 = enumerate_combinations(tables)
+    n = len(m)
+    rows = np.arange(n)[:, None]
+    bazaar = (tables['Compactor'][u1] | tables['Compactor'][u2])[:, None]
+
+    drops = tables['Minion Drops']
+    amount = drops['Amount'][m] * tables['Fuel Drops'][f][:, None]
+    chance = drops['Chance'][m] * (tables['Upgrade Chance'][u1] * tables['Upgrade Chance'][u2])[:, None]
+    base_coef = np.where(bazaar, amount * chance / drops['Craft'][m] * chance, 0)
+    base_const = np.where(bazaar[:, 0], 0, (amount * chance * drops['NPC Price'][m] * 0.7).sum(axis=1))
+
+    udrops = tables['Upgrade Drops']
+    cooldown = udrops['Cooldown'] > 0
+    num_drops = np.divide(86400, udrops['Cooldown'], out=np.zeros_like(udrops['Cooldown']), where=cooldown)
+    cpa_parts, flat_parts = [(rows, drops['Item'][m], base_coef)], []
+    cpa_const, flat_const = base_const, np.zeros(n)
+    for u in (u1, u2):
+        cpa_parts.append((rows, udrops['Item'][u], np.where(bazaar & ~cooldown[u], udrops['Amount'][u] / udrops['Craft'][u] * udrops['Chance'][u], 0)))
+        flat_parts.append((rows, udrops['Item'][u], np.where(bazaar & cooldown[u], num_drops[u] / udrops['Craft'][u], 0)))
+        cpa_const = cpa_const + np.where(bazaar[:, 0], 0, np.where(cooldown[u], 0, udrops['Amount'][u] * udrops['Chance'][u] * udrops['NPC Price'][u]).sum(axis=1))
+        flat_const = flat_const + np.where(bazaar[:, 0], 0, (num_drops[u] * udrops['NPC Price'][u]).sum(axis=1))
+
+    #The same terms split per drop with their chances, for simulate
+    draw_parts = [(rows, np.where(bazaar, drops['Item'][m], -1), chance,
+                   np.where(bazaar, base_coef, amount * chance * drops['NPC Price'][m] * 0.7))]
+    for u in (u1, u2):
+        value = np.where(bazaar, udrops['Amount'][u] / udrops['Craft'][u] * udrops['Chance'][u], udrops['Amount'][u] * udrops['Chance'][u] * udrops['NPC Price'][u])
+        draw_parts.append((rows, np.where(bazaar, udrops['Item'][u], -1), udrops['Chance'][u], np.where(cooldown[u], 0, value)))
+
+    upgrade_cost_parts = [(rows, tables['Fuel Cost']['Item'][f], tables['Fuel Cost']['Amount'][f])]
+    for u in (u1, u2):
+        upgrade_cost_parts.append((rows, tables['Upgrade Cost']['Item'][u], tables['Upgrade Cost']['Amount'][u]))
+
+    tiers = tables['Tiers']
+    max_tiers = tiers['Tier'].shape[1]
+    combo, slot = expand_tiers(tiers, m)
+    tier_rows = np.arange(len(tiers['Recipe']['Coins']))[:, None]
+    upgrade_dtype = pd.CategoricalDtype(tables['Upgrades'])
+    labels = pd.DataFrame({
+        "Minion": pd.Categorical.from_codes(m[combo], dtype=pd.CategoricalDtype(tables['Minions'])),
+        "Fuel": pd.Categorical.from_codes(f[combo], dtype=pd.CategoricalDtype(tables['Fuels'])),
+        "Upgrade 1": pd.Categorical.from_codes(u1[combo], dtype=upgrade_dtype),
+        "Upgrade 2": pd.Categorical.from_codes(u2[combo], dtype=upgrade_dtype)
+    })
+
+    return {
+        "Items": tables['Items'],
+        "Minions": tables['Minions'],
+        "Fuels": tables['Fuels'],
+        "Upgrades": tables['Upgrades'],
+        "Minion Info": tables['Minion Info'],
+        "Fuel Compatible": tables['Fuel Compatible'],
+        "Upgrade Valid": tables['Upgrade Valid'],
+        "Combos": {"Minion": m, "Fuel": f, "Upgrade 1": u1, "Upgrade 2": u2},
+        "Rows": {
+            "Combo": combo,
+            "Tier Slot": m[combo] * max_tiers + slot,
+            "Tier": tiers['Tier'][m[combo], slot],
+            "Speed": tiers['Speed'][m[combo], slot]
+        },
+        "Labels": labels,
+        "Speed Mod": np.round(1 + tables['Fuel Speed'][f] + tables['Upgrade Speed'][u1] + tables['Upgrade Speed'][u2], 2),
+        "CPA": _sparse(n, cpa_parts, cpa_const),
+        "CPA Draws": _draws(n, draw_parts),
+        "Flat": _sparse(n, flat_parts, flat_const),
+        "Daily Cost": _sparse(n, [(rows, tables['Fuel Daily Cost']['Item'][f], tables['Fuel Daily Cost']['Amount'][f])]),
+        "Upgrade Cost": _sparse(n, upgrade_cost_parts),
+        "Tier Cost": _sparse(len(tier_rows), [(tier_rows, tiers['Recipe']['Item'], tiers['Recipe']['Amount'])], tiers['Recipe']['Coins'])
+    }
+
+def expand_tiers(tiers, m):
+    """
+    Expands per-combination indices into one row per minion tier.
+
+    Args:
+        tiers (Dict): The 'Tiers' table from compile_tables.
+        m (np.ndarray): Minion index of each combination.
+
+    Returns:
+        Tuple of two int arrays: the combination index and the tier slot of each output row.
+    """
+    counts = tiers['Count'][m]
+    combo = np.repeat(np.arange(len(m)), counts)
+    slot = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return combo, slot
+
+def price_vectors(structure, bazaar_cache):
+    """
+    Looks up the Instant Buy and Instant Sell price of every structure item ID.
+
+    Args:
+        structure (Dict): The structure from build_structure.
+        bazaar_cache (Dict): A cache mapping item IDs to their bazaar prices.
+
+    Returns:
+        Tuple of two arrays: Instant Buy and Instant Sell prices, 0 for items missing from the bazaar.
+    """
+    instant_buy = np.array([bazaar_cache.get(item, {}).get('Instant Buy', 0) for item in structure['Items']], dtype=float)
+    instant_sell = np.array([bazaar_cache.get(item, {}).get('Instant Sell', 0) for item in structure['Items']], dtype=float)
+    return instant_buy, instant_sell
+
+def reprice(structure, bazaar_cache, compact=True):
+    """
+    Prices a precompiled structure into the per-tier setup frame.
+
+    Args:
+        structure (Dict): The structure from build_structure.
+        bazaar_cache (Dict): A cache mapping item IDs to their bazaar prices.
+        compact (bool): Emit categorical labels and the narrow COMPACT_DTYPES. Otherwise labels are strings
+            and numerics are 64-bit, as in create_minion_df.
+
+    Returns:
+        pd.DataFrame: One row per minion tier setup, in the same column layout as create_minion_df
+            with a leading 'Minion' column.
+    """
+    instant_buy, instant_sell = price_vectors(structure, bazaar_cache)
+    rows = structure['Rows']
+    combo = rows['Combo']
+
+    upgrade_cost = sparse_dot(structure['Upgrade Cost'], instant_sell)
+    tier_cost = sparse_dot(structure['Tier Cost'], instant_sell)
+    values = pd.DataFrame({
+        "Speed Mod": structure['Speed Mod'][combo],
+        "Tier": rows['Tier'],
+        "Speed": rows['Speed'],
+        "CPA": sparse_dot(structure['CPA'], instant_buy)[combo],
+        "Flat": sparse_dot(structure['Flat'], instant_buy)[combo],
+        "Cost": np.round(tier_cost[rows['Tier Slot']] + upgrade_cost[combo], 1),
+        "Daily Cost": sparse_dot(structure['Daily Cost'], instant_sell)[combo]
+    })
+    if compact:
+        return pd.concat([structure['Labels'], values.astype(COMPACT_DTYPES)], axis=1)
+    return pd.concat([structure['Labels'].astype(str), values], axis=1)
+
+def batch_minion_processing(minions, fuels, upgrades, bazaar_cache):
+    """
+    Batched replacement for minion_processing followed by create_minion_df.
+
+    Args:
+        minions (Dict): The minion dictionaries.
+        fuels (Dict): The fuel dictionaries.
+        upgrades (Dict): The upgrade dictionaries.
+        bazaar_cache (Dict): A cache mapping item IDs to their bazaar prices.
+
+    Returns:
+        pd.DataFrame: One row per minion tier setup, see reprice.
+    """
+    return reprice(build_structure(minions, fuels, upgrades), bazaar_cache, compact=False)
+
+def check_parity(minions, fuels, upgrades, bazaar_cache, rtol=1e-9):
+    """
+    Compares the batched engine against the dict-based minion_processing path.
+
+    Args:
+        minions (Dict): Minion dictionaries with tier 'Cost' already set.
+        fuels (Dict): Fuel dictionaries with 'Cost' and 'Daily Cost' already set.
+        upgrades (Dict): Upgrade dictionaries with 'Cost' already set.
+        bazaar_cache (Dict): A cache mapping item IDs to their bazaar prices.
+        rtol (float): Relative tolerance for numeric columns.
+
+    Returns:
+        pd.DataFrame: Rows that differ between the two engines, or that only one engine produced.
+            Empty when the engines agree.
+    """
+    key = ['Minion', 'Fuel', 'Upgrade 1', 'Upgrade 2', 'Tier']
+    numeric = ['Speed Mod', 'Speed', 'CPA', 'Flat', 'Cost', 'Daily Cost']
+
+    minion_dict = minion_processing(minions, fuels, upgrades, bazaar_cache, {})
+    reference = pd.concat(
+        [create_minion_df(data).assign(Minion=name) for name, data in minion_dict.items()],
+        ignore_index=True)
+    batched = batch_minion_processing(minions, fuels, upgrades, bazaar_cache)
+
+    merged = reference.merge(batched, on=key, how='outer', suffixes=(' (dict)', ' (batched)'), indicator=True)
+    mismatch = merged['_merge'] != 'both'
+    for column in numeric:
+        mismatch |= ~np.isclose(merged[column + ' (dict)'], merged[column + ' (batched)'], rtol=rtol, atol=1e-9)
+    return merged[mismatch]
+
+def add_misc_flags(base_df, minion_info):
+    """
+    Adds the per-row flags apply_combo uses to decide whether a miscellaneous combo's speed is reduced.
+
+    Args:
+        base_df (pd.DataFrame): A compact frame from reprice.
+        minion_info (Dict): Metadata about each minion, including 'Family' and 'Mob Spawning' status.
+
+    Returns:
+        pd.DataFrame: base_df with boolean 'Crystal Penalty' and 'Mob Penalty' columns. The Floating Crystal
+            speed is lost on Crystal Penalty rows, and 0.1 speed is lost on Mob Penalty rows whatever the combo.
+    """
+    names = base_df['Minion'].cat.categories
+    codes = base_df['Minion'].cat.codes.to_numpy()
+    crystal = np.array([minion_info[name]['Family'] not in ['Mining','Foraging', 'Farming'] for name in names])
+    mob = np.array([minion_info[name]['Mob Spawning'] == 1 for name in names])
+    return base_df.assign(**{
+        "Crystal Penalty": crystal[codes],
+        "Mob Penalty": mob[codes]
+    })
+
+def misc_mask(combo):
+    """
+    Encodes a miscellaneous upgrade combo as a bitmask over MISC_UPGRADES.
+
+    Args:
+        combo (Iterable): Upgrade names.
+
+    Returns:
+        int: The bitmask.
+    """
+    return sum(1 << MISC_UPGRADES.index(name) for name in set(combo))
+
+def misc_combo(mask):
+    """
+    Decodes a bitmask from misc_mask into the sorted tuple used by create_all_combos.
+
+    Args:
+        mask (int): The bitmask.
+
+    Returns:
+        tuple: Sorted upgrade names.
+    """
+    return tuple(sorted(name for i, name in enumerate(MISC_UPGRADES) if int(mask) >> i & 1))
+
+def combo_effects(all_combos):
+    """
+    Packs the miscellaneous upgrade combos into an effect table.
+
+    Args:
+        all_combos (Dict): A dictionary mapping upgrade combo tuples to their effect dictionaries, from create_all_combos.
+
+    Returns:
+        pd.DataFrame: One row per combo, indexed by its misc_mask bitmask, with 'Speed', 'Cost' and 'Daily Cost' columns.
+    """
+    return pd.DataFrame(
+        [[effect.get('Speed'), effect.get('Cost', 0), effect.get('Daily Cost') or 0] for effect in all_combos.values()],
+        index=pd.Index([misc_mask(combo) for combo in all_combos], dtype=np.uint8, name='Misc Upgrades'),
+        columns=['Speed', 'Cost', 'Daily Cost'])
+
+def combo_values(base, mask, effects):
+    """
+    Computes the combo-dependent stats of base rows as float64 arrays, without building a frame.
+
+    Args:
+        base (pd.DataFrame or Dict): Rows of a frame from add_misc_flags, or a dictionary of its columns as arrays.
+        mask (int): The combo's misc_mask bitmask.
+        effects (pd.DataFrame): The effect table from combo_effects.
+
+    Returns:
+        Dict: 'Speed Mod', 'Daily Cost', 'Cost', 'Profit' and 'ROI' arrays.
+    """
+    effect = effects.loc[mask]
+    penalty = np.asarray(base['Mob Penalty'])
+    if mask & misc_mask(["Floating Crystal"]):
+        penalty = penalty | np.asarray(base['Crystal Penalty'])
+
+    speed_mod = np.asarray(base['Speed Mod'], dtype=np.float64) + np.where(penalty, effect['Speed'] - 0.1, effect['Speed'])
+    daily_cost = np.asarray(base['Daily Cost'], dtype=np.float64) + effect['Daily Cost']
+    cost = np.asarray(base['Cost'], dtype=np.float64) + effect['Cost']
+    profit = np.asarray(base['CPA'], dtype=np.float64) * 86400 / (2 * np.asarray(base['Speed'], dtype=np.float64) / speed_mod) + np.asarray(base['Flat'], dtype=np.float64) - daily_cost
+    return {
+        "Speed Mod": speed_mod,
+        "Daily Cost": daily_cost,
+        "Cost": cost,
+        "Profit": profit,
+        "ROI": np.where(profit > 0, cost / profit, INT32_MAX)
+    }
+
+def evaluate_combo(base_df, mask, effects):
+    """
+    Computes one miscellaneous upgrade combo's stats for a subset of base rows at query time.
+
+    Lazy counterpart of apply_combo, giving the same Speed Mod, Cost, Daily Cost, Profit and ROI
+    without materializing every combo.
+
+    Args:
+        base_df (pd.DataFrame): Rows of a frame from add_misc_flags.
+        mask (int): The combo's misc_mask bitmask.
+        effects (pd.DataFrame): The effect table from combo_effects.
+
+    Returns:
+        pd.DataFrame: The rows with the combo applied, a bitmask 'Misc Upgrades' column after 'Upgrade 2' and a 'ROI' column.
+            New float columns take the dtype of 'CPA'.
+    """
+    values = combo_values(base_df, mask, effects)
+    df = base_df.drop(columns=['Crystal Penalty', 'Mob Penalty'])
+    dtype = df['CPA'].dtype
+    df['Cost'] = values['Cost'].astype(df['Cost'].dtype)
+    for column in ['Speed Mod', 'Daily Cost', 'Profit', 'ROI']:
+        df[column] = values[column].astype(dtype)
+    df.insert(df.columns.get_loc('Upgrade 2') + 1, 'Misc Upgrades', np.full(len(df), mask, dtype=np.uint8))
+    return df
+
+def _combo_frame_parts(chunk, all_combos, minion_info):
+    """
+    Builds the eager combo frame of a run of minions in compact form: label columns as integer codes
+    plus their values, numeric columns as arrays, so a worker process can return it cheaply.
+    """
+    parts = []
+    for name, minion_data in chunk:
+        base_df = create_minion_df(minion_data)
+        df = apply_all_combos(base_df.copy(), all_combos, minion_info[name])
+        columns = {}
+        for column in df:
+            if column == 'Misc Upgrades':
+                #apply_all_combos stacks one copy of the base rows per combo, in all_combos order
+                columns[column] = (np.repeat(np.arange(len(all_combos), dtype=np.int32), len(base_df)), list(all_combos))
+            elif df[column].dtype.kind in 'biuf':
+                columns[column] = df[column].to_numpy()
+            else:
+                codes, values = pd.factorize(df[column])
+                columns[column] = (codes.astype(np.int32), list(values))
+        parts.append({"Minion": name, "Length": len(df), "Columns": columns})
+    return parts
+
+def _merge_labels(parts):
+    """Concatenates (codes, values) label parts into one categorical, values in order of first appearance."""
+    categories = pd.Index([value for codes, values in parts for value in values], tupleize_cols=False).unique()
+    codes = [categories.get_indexer(pd.Index(values, tupleize_cols=False, dtype=object))[codes] for codes, values in parts]
+    return pd.Categorical.from_codes(np.concatenate(codes), categories=categories)
+
+def build_combo_frame(minion_dict, all_combos, minion_info, workers=None):
+    """
+    Builds the eager frame of every minion setup under every miscellaneous combo: create_minion_df and
+    apply_all_combos for each minion, with 'Minion' and 'ROI' columns.
+
+    Minions are independent, so with several workers each process builds contiguous runs of minions and
+    returns them as codes and arrays. The runs are merged in minion order, so the frame is the same for
+    any worker count.
+
+    Args:
+        minion_dict (Dict): The processed minions from fetch_and_process_data.
+        all_combos (Dict): The combos from create_all_combos.
+        minion_info (Dict): The metadata from fetch_and_process_data.
+        workers (int, optional): Worker processes, see resolve_workers.
+
+    Returns:
+        pd.DataFrame: One row per minion tier setup and combo. Label columns are categorical.
+    """
+    workers = resolve_workers(workers)
+    items = list(minion_dict.items())
+    if workers > 1 and len(items) > 1:
+        chunks = split_chunks(items, workers * 4)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_combo_frame_parts, chunk, all_combos, minion_info) for chunk in chunks]
+            parts = [part for future in futures for part in future.result()]
+    else:
+        parts = _combo_frame_parts(items, all_combos, minion_info)
+    if not parts:
+        return pd.DataFrame()
+
+    columns = {}
+    for column, first in parts[0]['Columns'].items():
+        if isinstance(first, tuple):
+            columns[column] = _merge_labels([part['Columns'][column] for part in parts])
+        else:
+            columns[column] = np.concatenate([part['Columns'][column] for part in parts])
+    columns['Minion'] = pd.Categorical.from_codes(
+        np.repeat(np.arange(len(parts), dtype=np.int32), [part['Length'] for part in parts]),
+        categories=[part['Minion'] for part in parts]
+    )
+    df = pd.DataFrame(columns)
+    df['ROI'] = np.where(df['Profit'] > 0, df['Cost'] / df['Profit'], INT32_MAX)
+    return df
+
+def snapshot_items(structure):
+    """
+    Lists the item IDs whose prices evaluate_snapshots needs: the structure's items, then the misc upgrade items.
+    """
+    return list(structure['Items']) + [item for item in MISC_ITEMS if item not in structure['Items']]
+
+def evaluate_snapshots(structure, rows, prices, misc_upgrades=()):
+    """
+    Evaluates the profit model for a set of setups under a stack of price snapshots in one batched computation.
+
+    The coefficient rows the setups use become dense blocks, so every snapshot is priced by a single matrix
+    product, and the misc combo's effect is computed for all snapshots at once by passing price Series through
+    create_all_combos.
+
+    Args:
+        structure (Dict): The structure from build_structure.
+        rows (np.ndarray): Setup rows, i.e. row positions of reprice's frame, e.g. from SetupTable.filter.
+        prices (Dict): 'Postcard' costs of shape (snapshots,), and 'Instant Buy' and 'Instant Sell' prices of shape
+            (snapshots, items) over snapshot_items, e.g. from PriceHistory.load.
+        misc_upgrades (Iterable): Miscellaneous upgrade names.
+
+    Returns:
+        Dict: 'Labels' (the setups' label and Tier columns), 'Speed Mod' of shape (rows,), and 'Profit', 'Cost'
+            and 'ROI' arrays of shape (snapshots, rows).
+
+    Raises:
+        ValueError: If the misc upgrades can't be combined.
+    """
+    rows = np.asarray(rows)
+    n_items = len(structure['Items'])
+    column = {item: i for i, item in enumerate(snapshot_items(structure))}
+
+    #create_all_combos is linear in prices, so price Series give every snapshot's effects at once
+    misc_prices = {
+        item: {field: pd.Series(prices[field][:, column[item]]) for field in ["Instant Buy", "Instant Sell"]}
+        for item in MISC_ITEMS
+    }
+    mask = misc_mask(misc_upgrades)
+    effect = create_all_combos(misc_prices, pd.Series(prices['Postcard'])).get(misc_combo(mask))
+    if effect is None:
+        raise ValueError("These misc upgrades can't be combined")
+
+    combos, combo_of_row = np.unique(structure['Rows']['Combo'][rows], return_inverse=True)
+    slots, slot_of_row = np.unique(structure['Rows']['Tier Slot'][rows], return_inverse=True)
+    def price(matrix, matrix_rows, field):
+        dense, const = dense_rows(structure[matrix], matrix_rows, n_items)
+        return prices[field][:, :n_items] @ dense + const
+
+    cpa = price('CPA', combos, 'Instant Buy')[:, combo_of_row]
+    flat = price('Flat', combos, 'Instant Buy')[:, combo_of_row]
+    daily_cost = price('Daily Cost', combos, 'Instant Sell')[:, combo_of_row] + np.reshape(np.asarray(effect.get('Daily Cost', 0)), (-1, 1))
+    cost = np.round(price('Tier Cost', slots, 'Instant Sell')[:, slot_of_row] + price('Upgrade Cost', combos, 'Instant Sell')[:, combo_of_row], 1)
+    cost = cost + np.reshape(np.asarray(effect.get('Cost', 0)), (-1, 1))
+
+    labels = add_misc_flags(structure['Labels'].iloc[rows].reset_index(drop=True), structure['Minion Info'])
+    penalty = labels['Mob Penalty'].to_numpy()
+    if mask & misc_mask(["Floating Crystal"]):
+        penalty = penalty | labels['Crystal Penalty'].to_numpy()
+    speed_mod = structure['Speed Mod'][structure['Rows']['Combo'][rows]] + np.where(penalty, effect['Speed'] - 0.1, effect['Speed'])
+    profit = cpa * 86400 / (2 * structure['Rows']['Speed'][rows] / speed_mod) + flat - daily_cost
+    roi = np.where(profit > 0, cost / np.where(profit > 0, profit, 1), INT32_MAX)
+
+    labels = labels.drop(columns=['Crystal Penalty', 'Mob Penalty']).assign(Tier=structure['Rows']['Tier'][rows])
+    return {
+        "Labels": labels.set_index(rows),
+        "Speed Mod": speed_mod,
+        "Profit": profit,
+        "Cost": cost,
+        "ROI": roi
+    }
+
+def replay(structure, rows, history, misc_upgrades=(), start=None, end=None):
+    """
+    Evaluates the profit model for a set of setups at every stored price snapshot, see evaluate_snapshots.
+
+    Args:
+        structure (Dict): The structure from build_structure.
+        rows (np.ndarray): Setup rows, i.e. row positions of reprice's frame, e.g. from SetupTable.filter.
+        history (PriceHistory): The snapshot store.
+        misc_upgrades (Iterable): Miscellaneous upgrade names.
+        start, end (float, optional): Inclusive timestamp bounds.
+
+    Returns:
+        Dict: 'Labels' (the setups' label and Tier columns), and 'Profit', 'Cost' and 'ROI' DataFrames with one
+            row per snapshot, indexed by fetch time, and one column per setup row.
+
+    Raises:
+        ValueError: If the misc upgrades can't be combined.
+    """
+    rows = np.asarray(rows)
+    prices = history.load(snapshot_items(structure), start, end)
+    values = evaluate_snapshots(structure, rows, prices, misc_upgrades)
+    index = pd.to_datetime(prices['Fetched'], unit='s')
+    index.name = 'Fetched'
+    return {
+        "Labels": values['Labels'],
+        "Profit": pd.DataFrame(values['Profit'], index=index, columns=rows),
+        "Cost": pd.DataFrame(values['Cost'], index=index, columns=rows),
+        "ROI": pd.DataFrame(values['ROI'], index=index, columns=rows)
+    }
+
+def _row_entries(matrix, matrix_rows):
+    """
+    Gathers the entries of the given matrix rows.
+
+    Args:
+        matrix (Dict): A coefficient matrix from build_structure.
+        matrix_rows (np.ndarray): One matrix row per setup; may repeat.
+
+    Returns:
+        Tuple of the setup position and the matrix entry index of each entry, grouped by position.
+    """
+    counts = np.bincount(matrix['Row'], minlength=len(matrix['Const']))
+    order = np.argsort(matrix['Row'], kind='stable')
+    starts = np.cumsum(counts) - counts
+    n = counts[matrix_rows]
+    position = np.repeat(np.arange(len(matrix_rows)), n)
+    offset = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+    return position, order[np.repeat(starts[matrix_rows], n) + offset]
+
+def sensitivity(structure, bazaar_cache, postcard_cost, rows, misc_upgrades=()):
+    """
+    Computes how every setup's daily profit and ROI respond to each bazaar price, and the break-even prices.
+
+    Profit is linear in each price with the other prices held, with the Instant Buy price of drops and the Instant
+    Sell price of fuels and misc upgrade items as slopes read straight from the coefficient matrices, so every
+    setup is covered in one pass. The misc upgrade items' slopes come from create_all_combos at unit prices,
+    so they follow whatever the combo charges.
+
+    Args:
+        structure (Dict): The structure from build_structure.
+        bazaar_cache (Dict): A cache mapping item IDs to their bazaar prices.
+        postcard_cost (float): The cheapest Postcard BIN, e.g. a price provider's 'Postcard'.
+        rows (np.ndarray): Setup rows, i.e. row positions of reprice's frame, e.g. from SetupTable.filter.
+        misc_upgrades (Iterable): Miscellaneous upgrade names.
+
+    Returns:
+        Dict: 'Sensitivity', one row per setup and price it depends on, with the setup 'Row', 'Item', 'Price'
+            ('Instant Buy' or 'Instant Sell'), current 'Value', 'dProfit' and 'dROI' (per coin of price, NaN for
+            ROI where profit isn't positive) and 'Break Even' (the price at which profit reaches 0, NaN if no
+            price does). 'Summary', indexed by setup row, with 'Profit', 'ROI' and the nearest break-even as
+            'Break Even Item', 'Break Even Price', 'Break Even' and 'Margin' (the relative price move it takes).
+
+    Raises:
+        ValueError: If the misc upgrades can't be combined.
+    """
+    rows = np.asarray(rows)
+    items = snapshot_items(structure)
+    column = {item: i for i, item in enumerate(items)}
+    instant_buy = np.array([bazaar_cache.get(item, {}).get('Instant Buy', 0) for item in items], dtype=float)
+    instant_sell = np.array([bazaar_cache.get(item, {}).get('Instant Sell', 0) for item in items], dtype=float)
+    prices = {"Postcard": np.array([postcard_cost], dtype=float), "Instant Buy": instant_buy[None], "Instant Sell": instant_sell[None]}
+    values = evaluate_snapshots(structure, rows, prices, misc_upgrades)
+    profit, cost = values['Profit'][0], values['Cost'][0]
+    rate = 86400 / (2 * structure['Rows']['Speed'][rows] / values['Speed Mod'])
+
+    #Each part is (setup position, item column, 0 for Instant Buy or 1 for Instant Sell, dProfit, dCost)
+    combo = structure['Rows']['Combo'][rows]
+    def entries(name, matrix_rows):
+        position, entry = _row_entries(structure[name], matrix_rows)
+        return position, structure[name]['Col'][entry], structure[name]['Value'][entry]
+    parts = []
+    position, col, value = entries('CPA', combo)
+    parts.append((position, col, 0, value * rate[position], 0))
+    position, col, value = entries('Flat', combo)
+    parts.append((position, col, 0, value, 0))
+    position, col, value = entries('Daily Cost', combo)
+    parts.append((position, col, 1, -value, 0))
+    position, col, value = entries('Upgrade Cost', combo)
+    parts.append((position, col, 1, 0, value))
+    position, col, value = entries('Tier Cost', structure['Rows']['Tier Slot'][rows])
+    parts.append((position, col, 1, 0, value))
+
+    unit = {item: {"Instant Buy": 0, "Instant Sell": 0} for item in MISC_ITEMS}
+    for item in MISC_ITEMS:
+        effect = create_all_combos({**unit, item: {"Instant Buy": 0, "Instant Sell": 1}}, 0)[misc_combo(misc_mask(misc_upgrades))]
+        if effect.get('Cost', 0) or effect.get('Daily Cost', 0):
+            parts.append((np.arange(len(rows)), column[item], 1, -effect.get('Daily Cost', 0), effect.get('Cost', 0)))
+
+    position, col, side, d_profit, d_cost = [np.concatenate([np.broadcast_to(part[i], part[0].shape) for part in parts]) for i in range(5)]
+    key, entry = np.unique((position * 2 + side) * len(items) + col, return_inverse=True)
+    d_profit = np.bincount(entry, weights=d_profit, minlength=len(key))
+    d_cost = np.bincount(entry, weights=d_cost, minlength=len(key))
+    position, side, col = key // (2 * len(items)), key // len(items) % 2, key % len(items)
+
+    price = np.where(side == 0, instant_buy[col], instant_sell[col])
+    setup_profit = profit[position]
+    positive = setup_profit > 0
+    d_roi = np.where(positive, (d_cost * setup_profit - cost[position] * d_profit) / np.where(positive, setup_profit, 1) ** 2, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        break_even = price - setup_profit / d_profit
+    break_even = np.where((d_profit != 0) & (break_even >= 0), break_even, np.nan)
+
+    frame = pd.DataFrame({
+        "Row": rows[position],
+        "Item": pd.Categorical.from_codes(col, items),
+        "Price": pd.Categorical.from_codes(side, ["Instant Buy", "Instant Sell"]),
+        "Value": price,
+        "dProfit": d_profit,
+        "dROI": d_roi,
+        "Break Even": break_even
+    })
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        margin = np.abs(break_even - price) / price
+    margin = np.where(np.isfinite(margin), margin, np.inf)
+    order = np.lexsort((margin, position))
+    first = order[np.unique(position[order], return_index=True)[1]]
+    first = first[np.isfinite(margin[first])]
+    summary = pd.DataFrame({"Profit": profit, "ROI": values['ROI'][0]}, index=pd.Index(rows, name='Row'))
+    nearest = frame.iloc[first].set_index("Row")
+    summary['Break Even Item'] = nearest['Item']
+    summary['Break Even Price'] = nearest['Price']
+    summary['Break Even'] = nearest['Break Even']
+    summary['Margin'] = pd.Series(margin[first], index=nearest.index)
+    return {"Sensitivity": frame, "Summary": summary}
+
+def simulate(structure, bazaar_cache, postcard_cost, rows, misc_upgrades=(), horizon=1, samples=1000, seed=0, memory_mb=256):
+    """
+    Simulates the daily profit of every setup over a horizon, drawing how often each random drop lands.
+
+    Each setup makes floor(horizon * actions per day) actions, and each of its drops succeeds on an action with
+    its chance, so its successes are one binomial draw per sample rather than a loop over actions. Successes
+    yield the drop's expected value divided by its chance. Cooldown drops, fuel costs and misc upgrade costs
+    don't depend on chance and stay at their expected values. Setups are simulated in chunks whose draws fit
+    in memory_mb.
+
+    Args:
+        structure (Dict): The structure from build_structure.
+        bazaar_cache (Dict): A cache mapping item IDs to their bazaar prices.
+        postcard_cost (float): The cheapest Postcard BIN, e.g. a price provider's 'Postcard'.
+        rows (np.ndarray): Setup rows, i.e. row positions of reprice's frame, e.g. from SetupTable.filter.
+        misc_upgrades (Iterable): Miscellaneous upgrade names.
+        horizon (float): Days simulated; profit is averaged over them.
+        samples (int): Simulated horizons per setup.
+        seed (int): Random seed. Results are reproducible for the same seed and memory_mb.
+        memory_mb (float): Memory budget for one chunk of draws.
+
+    Returns:
+        pd.DataFrame: Indexed by setup row, with the model's 'Expected' daily profit and the simulated 'P5', 'P50'
+            and 'P95' daily profit percentiles.
+
+    Raises:
+        ValueError: If the misc upgrades can't be combined.
+    """
+    rows = np.asarray(rows)
+    items = snapshot_items(structure)
+    instant_buy = np.array([bazaar_cache.get(item, {}).get('Instant Buy', 0) for item in items], dtype=float)
+    instant_sell = np.array([bazaar_cache.get(item, {}).get('Instant Sell', 0) for item in items], dtype=float)
+    prices = {"Postcard": np.array([postcard_cost], dtype=float), "Instant Buy": instant_buy[None], "Instant Sell": instant_sell[None]}
+    values = evaluate_snapshots(structure, rows, prices, misc_upgrades)
+    profit = values['Profit'][0]
+    rate = 86400 / (2 * structure['Rows']['Speed'][rows] / values['Speed Mod'])
+    combo = structure['Rows']['Combo'][rows]
+    fixed = profit - sparse_dot(structure['CPA'], instant_buy[:len(structure['Items'])])[combo] * rate
+    actions = np.floor(rate * horizon).astype(np.int64)
+
+    draws = structure['CPA Draws']
+    draw_value = np.where(draws['Col'] >= 0, draws['Value'] * instant_buy[np.maximum(draws['Col'], 0)], draws['Value'])
+    position, entry = _row_entries(draws, combo)
+    ends = np.cumsum(np.bincount(position, minlength=len(rows)))
+
+    #Draws and their values take 16 bytes per sample and entry, the per-setup sums and percentiles about as much again
+    per_chunk = max(int(memory_mb * 2**20 // (32 * samples)), 1)
+    rng = np.random.default_rng(seed)
+    percentiles = np.empty((3, len(rows)))
+    start = 0
+    while start < len(rows):
+        first = ends[start - 1] if start else 0
+        stop = max(int(np.searchsorted(ends, first + per_chunk, side='right')), start + 1)
+        chunk = entry[first:ends[stop - 1]]
+        setup = position[first:ends[stop - 1]]
+        successes = rng.binomial(actions[setup], draws['Chance'][chunk], size=(samples, len(chunk)))
+        bounds = ends[start:stop] - first
+        starts = np.concatenate(([0], bounds[:-1]))
+        per_setup = np.zeros((samples, stop - start))
+        if len(chunk):
+            #reduceat gives a setup without entries the next entry's value, so those are set back to 0
+            per_setup = np.add.reduceat(successes * draw_value[chunk], np.minimum(starts, len(chunk) - 1), axis=1)
+            per_setup[:, starts == bounds] = 0
+        del successes
+        percentiles[:, start:stop] = np.percentile(per_setup / horizon + fixed[start:stop], [5, 50, 95], axis=0)
+        start = stop
+
+    return pd.DataFrame({
+        "Expected": profit,
+        "P5": percentiles[0],
+        "P50": percentiles[1],
+        "P95": percentiles[2]
+    }, index=pd.Index(rows, name='Row'))
+
+def memory_report(frames):
+    """
+    Measures the resident bytes per row of each column, including string and tuple payloads.
+
+    Args:
+        frames (Dict): Maps a label to a DataFrame, e.g. {"Before": eager_df, "After": compact_df}.
+
+    Returns:
+        pd.DataFrame: Bytes per row with one column per frame and a final 'Total' row.
+    """
+    report = pd.DataFrame({
+        label: df.memory_usage(index=False, deep=True) / max(len(df), 1)
+        for label, df in frames.items()
+    })
+    report.loc['Total'] = report.sum()
+    return report
@@ -1,9 +1,14 @@
-import requests
 import itertools
 import math
 import copy
 import json
+import os
+import numpy as np
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from prices import get_provider
+from instrument import BuildTrace, trace_memory
 
 def is_compatible(minion, upgrade):
     """
@@ -27,6 +32,46 @@ def is_compatible(minion, upgrade):
         return False
     return True
 
+def compatibility_matrices(minions, fuels, upgrades):
+    """
+    Compiles the compatibility rules declared in the data files into lookup tables.
+
+    The rules are each fuel and upgrade 'Condition' (see is_compatible), a minion's 'Required Upgrade'
+    that always fills the second upgrade slot, an upgrade's 'Incompatible' list and its 'Dupe' flag.
+
+    Args:
+        minions (Dict): The minion dictionaries.
+        fuels (Dict): The fuel dictionaries.
+        upgrades (Dict): The upgrade dictionaries.
+
+    Returns:
+        Dict: 'Fuel', a boolean (minion, fuel) matrix, and 'Upgrade', a boolean (minion, upgrade 1, upgrade 2) tensor.
+            Each valid upgrade pair is set in one slot only, in the order the setups are listed.
+    """
+    minion_list = list(minions.values())
+    upgrade_keys = list(upgrades)
+    upgrade_list = list(upgrades.values())
+
+    fuel_ok = np.array([[is_compatible(minion, fuel) for fuel in fuels.values()] for minion in minion_list], dtype=bool)
+    upgrade_ok = np.array([[is_compatible(minion, upgrade) for upgrade in upgrade_list] for minion in minion_list], dtype=bool)
+
+    allowed = ~np.eye(len(upgrade_list), dtype=bool)
+    for i, upgrade in enumerate(upgrade_list):
+        allowed[i, i] = upgrade.get('Dupe', False)
+        for other in upgrade.get('Incompatible', []):
+            j = upgrade_keys.index(other)
+            allowed[i, j] = allowed[j, i] = False
+
+    valid = np.triu(allowed)[None] & upgrade_ok[:, :, None] & upgrade_ok[:, None, :]
+    for m, minion in enumerate(minion_list):
+        required = minion.get('Required Upgrade')
+        if required:
+            r = upgrade_keys.index(required)
+            valid[m] = False
+            valid[m, :, r] = allowed[:, r] & upgrade_ok[m] & upgrade_ok[m, r]
+
+    return {"Fuel": fuel_ok, "Upgrade": valid}
+
 def apply_all_drop_modifiers(minion, fuel, u1,u2):
     """
     Modifies the minion's drops in-place based on fuel and upgrade modifiers.
@@ -146,7 +191,32 @@ def calculate_profit(minion,flags={},bazaar=False,bazaar_cache={},misc_upgrades=
     }
 )
 
-def minion_processing(minions, fuels, upgrades, bazaar_cache,misc_upgrades):
+def resolve_workers(workers=None):
+    """
+    Resolves a worker process count.
+
+    Args:
+        workers (int, optional): The requested count; 0 or less means one per CPU.
+            Defaults to the BUILD_WORKERS environment variable, or 1 (no pool) if it is unset.
+
+    Returns:
+        int: The number of worker processes.
+    """
+    if workers is None:
+        workers = int(os.environ.get("BUILD_WORKERS", 1))
+    return workers if workers > 0 else os.cpu_count() or 1
+
+def split_chunks(keys, n_chunks):
+    """
+    Splits keys into at most n_chunks contiguous, similarly sized runs, keeping their order.
+    """
+    keys = list(keys)
+    n_chunks = max(1, min(n_chunks, len(keys)))
+    size, extra = divmod(len(keys), n_chunks)
+    bounds = np.cumsum([0] + [size + (i < extra) for i in range(n_chunks)])
+    return [keys[bounds[i]:bounds[i + 1]] for i in range(n_chunks)]
+
+def minion_processing(minions, fuels, upgrades, bazaar_cache,misc_upgrades,workers=None):
     """
     Computes profit outcomes for all compatible fuel and upgrade combinations across all minions
 
@@ -155,37 +225,41 @@ def minion_processing(minions, fuels, upgrades, bazaar_cache,misc_upgrades):
         fuels (Dict): Stores all the base fuel information and properties.
         upgrades (Dict): Stores all the base upgrade information and properties.
         bazaar_cache (Dict): A cache mapping item IDs to their bazaar prices.
+        workers (int, optional): Worker processes to spread the minions across, see resolve_workers.
+            Each takes contiguous runs of minions and the runs are merged in order, so the output
+            is identical to the serial one.
 
     Returns:
         A nested dict with all of the desireable outputs
     """
+    workers = resolve_workers(workers)
+    if workers > 1 and len(minions) > 1:
+        #Several runs per worker even out minions with many more combinations than others
+        chunks = split_chunks(minions, workers * 4)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(minion_processing, {key: minions[key] for key in chunk}, fuels, upgrades, bazaar_cache, misc_upgrades, 1)
+                for chunk in chunks
+            ]
+            all_combinations = {}
+            for future in futures:
+                all_combinations.update(future.result())
+        return all_combinations
+
     all_combinations = {}
     fuel_list = list(fuels.values())
-    upgrade_items = list(upgrades.items())
+    upgrade_list = list(upgrades.values())
+    compatible = compatibility_matrices(minions, fuels, upgrades)
 
-    for minion in minions.values():
+    for m, minion in enumerate(minions.values()):
         if minion['Name'] not in all_combinations:
             all_combinations[minion['Name']] = {}
 
-        for fuel in fuel_list:
-            if not is_compatible(minion,fuel):
-                continue
-
-            for (key1, up1), (key2, up2) in itertools.combinations_with_replacement(upgrade_items, 2):
-                if minion['Name'] == "Gravel Minion":
-                    key2 = "FLINT_SHOVEL"
-                    up2 = upgrades['FLINT_SHOVEL']
-
-                if minion['Name'] in ['Iron Minion', 'Gold Minion', 'Cactus Minion']: 
-                    key2 = "SUPER_COMPACTOR_3000"
-                    up2 = upgrades['SUPER_COMPACTOR_3000']
+        for f in np.flatnonzero(compatible['Fuel'][m]):
+            fuel = fuel_list[f]
 
-                if key1 == key2 and not up1.get("Dupe", False):
-                    continue
-                if not all(is_compatible(minion, u) for u in (up1, up2)):
-                    continue
-                if {key1, key2} == {"SUPER_COMPACTOR_3000", "CORRUPT_SOIL"}:
-                    continue
+            for i, j in zip(*np.nonzero(compatible['Upgrade'][m])):
+                up1, up2 = upgrade_list[i], upgrade_list[j]
 
                 flags = {
                     "Fuel": fuel,
@@ -198,17 +272,12 @@ def minion_processing(minions, fuels, upgrades, bazaar_cache,misc_upgrades):
                 all_combinations[minion['Name']][combination] = tiers
     return all_combinations
 
-def fetch_and_process_data(misc_upgrades={}):
+def load_data():
     """
-    Loads, enriches, and processes raw minion, fuel, and upgrade data for Hypixel Skyblock minion calculations.
-
-    Args:
-        misc_upgrades (dict, optional): A dictionary of additional upgrades or modifiers 
-            that should be considered when processing minions. Defaults to an empty dict.
+    Loads the raw minion, fuel and upgrade data files.
 
     Returns:
-        minion_dict (dict): A fully processed dictionary of minions with all costs and modifiers applied.
-        minion_info (dict): A dictionary mapping minion names to metadata such as family and mob spawning type.
+        Tuple of the minion, fuel and upgrade dictionaries.
     """
     with open("_data.json","r") as file:
         minions = json.load(file)
@@ -219,14 +288,18 @@ def fetch_and_process_data(misc_upgrades={}):
     with open("_upgrades.json","r") as file:
         upgrades = json.load(file)
 
-    bazaar_cache = {
-        k: {
-            "Instant Sell": v["quick_status"]["sellPrice"],
-            "Instant Buy": v["quick_status"]["buyPrice"]
-        }
-        for k, v in requests.get("https://api.hypixel.net/v2/skyblock/bazaar").json()['products'].items()
-    }
+    return minions, fuels, upgrades
+
+def price_data(minions, fuels, upgrades, bazaar_cache):
+    """
+    Sets the tier, fuel and upgrade costs in-place from bazaar prices.
 
+    Args:
+        minions (Dict): The raw minion dictionaries.
+        fuels (Dict): The raw fuel dictionaries.
+        upgrades (Dict): The raw upgrade dictionaries.
+        bazaar_cache (Dict): A cache mapping item IDs to their bazaar prices.
+    """
     for name, minion in minions.items():
         for tier in minion['Tiers']:
             tier['Cost'] = 0
@@ -249,38 +322,80 @@ def fetch_and_process_data(misc_upgrades={}):
     for name in upgrades:
         upgrades[name]['Cost'] = bazaar_cache.get(name, {}).get('Instant Sell', 0)
 
-    minion_dict = minion_processing(copy.deepcopy(minions), copy.deepcopy(fuels), copy.deepcopy(upgrades), copy.deepcopy(bazaar_cache),misc_upgrades)
-    minion_info = {
+def fetch_and_process_data(misc_upgrades={}, bazaar_cache=None, data=None, workers=None):
+    """
+    Loads, enriches, and processes raw minion, fuel, and upgrade data for Hypixel Skyblock minion calculations.
+
+    Args:
+        misc_upgrades (dict, optional): A dictionary of additional upgrades or modifiers 
+            that should be considered when processing minions. Defaults to an empty dict.
+        bazaar_cache (Dict, optional): Bazaar prices to use. Defaults to the shared price provider's prices.
+        data (tuple, optional): Minion, fuel and upgrade dictionaries to use instead of the data files.
+            They are copied, not modified.
+        workers (int, optional): Worker processes for minion_processing, see resolve_workers.
+
+    Returns:
+        minion_dict (dict): A fully processed dictionary of minions with all costs and modifiers applied.
+        minion_info (dict): A dictionary mapping minion names to metadata such as family and mob spawning type.
+    """
+    #Tracing allocations slows the deep copies in minion_processing several times over
+    with BuildTrace("fetch_and_process_data", memory=trace_memory(default=False)) as trace:
+        with trace.stage("Load Data") as stage:
+            minions, fuels, upgrades = load_data() if data is None else copy.deepcopy(data)
+            stage['Rows'] = len(minions)
+
+        if bazaar_cache is None:
+            with trace.stage("Fetch Prices") as stage:
+                prices = get_provider().fetch()
+                bazaar_cache = prices['Bazaar']
+                stage['Rows'] = len(bazaar_cache)
+            for name, seconds in prices['Seconds'].items():
+                trace.add(f"Fetch {name}", seconds)
+
+        with trace.stage("Price Data"):
+            price_data(minions, fuels, upgrades, bazaar_cache)
+
+        with trace.stage("Minion Processing") as stage:
+            minion_dict = minion_processing(copy.deepcopy(minions), copy.deepcopy(fuels), copy.deepcopy(upgrades), copy.deepcopy(bazaar_cache),misc_upgrades,workers)
+            stage['Rows'] = sum(len(setups) for setups in minion_dict.values())
+
+        with trace.stage("Minion Metadata"):
+            minion_info = minion_metadata(minions)
+    
+    return minion_dict,minion_info
+
+def minion_metadata(minions):
+    """
+    Extracts the per-minion metadata used when applying miscellaneous upgrades.
+
+    Args:
+        minions (Dict): The minion dictionaries.
+
+    Returns:
+        Dict: A dictionary mapping minion names to their 'Family' and 'Mob Spawning' values.
+    """
+    return {
         minion_name: {
             "Family": data.get("Family"),
             "Mob Spawning": data.get("Mob Spawning")
         }for minion_name, data in minions.items()}
-    
-    return minion_dict,minion_info
 
-def create_all_combos(bazaar_cache):
+def create_all_combos(bazaar_cache, postcard_cost=None):
     """
     Computes all valid miscellaneous upgrade combinations and their total speed and cost values.
 
     Args:
         bazaar_cache (Dict): A dictionary mapping item IDs to their current bazaar prices,
             containing 'Instant Sell' and 'Instant Buy' values.
+        postcard_cost (float, optional): The cheapest Postcard BIN. Defaults to the shared price provider's
+            latest price, without a new request if it has already fetched.
 
     Returns:
         Dict: A dictionary where each key is a tuple of upgrade names (sorted),
         and each value is a dictionary with total 'Speed' and 'Cost' for that combo.
     """
-    try:
-        response = requests.get('https://sky.coflnet.com/api/auctions/tag/POSTCARD/active/bin')
-        response.raise_for_status()  # make sure HTTP was 200 OK
-        auctions = response.json()
-        if auctions:
-            postcard_cost = auctions[0]['startingBid']
-        else:
-            postcard_cost = 0  # default if no active BINs
-    except (requests.RequestException, ValueError, KeyError, IndexError):
-        # fallback in case of network error or unexpected JSON
-        postcard_cost = 0
+    if postcard_cost is None:
+        postcard_cost = get_provider().latest()['Postcard']
     base_flags = {
         "Floating Crystal": {
             "Speed": 0.1,
@@ -0,0 +1,206 @@
+import os
+import json
+import threading
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:
+    #Windows has no fcntl; appends there are only locked between threads of one process
+    fcntl = None
+
+HISTORY_DIR = os.path.join(".cache", "history")
+FIELDS = {
+    "Fetched": "fetched.f64",
+    "Postcard": "postcard.f64",
+    "Instant Buy": "instant_buy.f64",
+    "Instant Sell": "instant_sell.f64"
+}
+
+class PriceHistory:
+    """
+    An append-only store of price snapshots, one raw float64 file per field, read back memory-mapped.
+
+    Each snapshot appends one row of Instant Buy and Instant Sell prices over a fixed item list, so a
+    field file is a (snapshots, items) matrix. When a snapshot brings new items, a new segment starts with
+    the longer item list; readers line segments up by item. Timestamps are written last, so a snapshot
+    interrupted mid-append is ignored by readers and cut off by the next append. Appends hold a file lock on
+    the store, so several processes can write to it, and a snapshot with the same prices as the last stored
+    one is not repeated.
+
+    Args:
+        path (str): The store directory.
+    """
+    def __init__(self, path=HISTORY_DIR):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _segments(self):
+        """Lists the segment directories in order."""
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(name for name in os.listdir(self.path) if name.isdigit())
+
+    def _segment_items(self, segment):
+        with open(os.path.join(self.path, segment, "items.json"), "r") as file:
+            return json.load(file)
+
+    def _read(self, segment, items):
+        """Memory-maps one segment's fields, trimmed to its complete snapshots."""
+        directory = os.path.join(self.path, segment)
+        fetched_path = os.path.join(directory, FIELDS['Fetched'])
+        count = os.path.getsize(fetched_path) // 8 if os.path.exists(fetched_path) else 0
+        if count == 0:
+            return None
+        width = len(items)
+        return {
+            "Fetched": np.memmap(fetched_path, dtype=np.float64, mode='r', shape=(count,)),
+            "Postcard": np.memmap(os.path.join(directory, FIELDS['Postcard']), dtype=np.float64, mode='r', shape=(count,)),
+            "Instant Buy": np.memmap(os.path.join(directory, FIELDS['Instant Buy']), dtype=np.float64, mode='r', shape=(count, width)),
+            "Instant Sell": np.memmap(os.path.join(directory, FIELDS['Instant Sell']), dtype=np.float64, mode='r', shape=(count, width))
+        }
+
+    def last_fetched(self):
+        """Returns the newest stored timestamp, or 0 if the store is empty."""
+        for segment in reversed(self._segments()):
+            data = self._read(segment, self._segment_items(segment))
+            if data is not None:
+                return float(data['Fetched'][-1])
+        return 0
+
+    def __len__(self):
+        total = 0
+        for segment in self._segments():
+            data = self._read(segment, self._segment_items(segment))
+            total += 0 if data is None else len(data['Fetched'])
+        return total
+
+    @contextmanager
+    def _locked(self):
+        """Holds the thread lock and an exclusive lock on the store shared with other processes."""
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.path, ".lock"), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _last_row(self):
+        """Returns the newest stored snapshot as a dict of its fields over its segment's items, or None."""
+        for segment in reversed(self._segments()):
+            items = self._segment_items(segment)
+            data = self._read(segment, items)
+            if data is not None:
+                last = {field: np.array(data[field][-1:]).ravel() for field in data}
+                last['Items'] = items
+                return last
+        return None
+
+    def append(self, bazaar_cache, fetched, postcard_cost=0):
+        """
+        Appends one snapshot. Snapshots no newer than the last stored one, or with the same prices, are skipped,
+        so a revalidated but unchanged bazaar response does not repeat a row.
+
+        Partial rows left by an interrupted append are cut off first, and the whole append holds a file lock,
+        so several processes can share one store.
+
+        Args:
+            bazaar_cache (Dict): A cache mapping item IDs to their bazaar prices.
+            fetched (float): The snapshot's timestamp.
+            postcard_cost (float): The cheapest Postcard BIN.
+
+        Returns:
+            bool: Whether the snapshot was stored.
+        """
+        with self._locked():
+            last = self._last_row()
+            if last is not None and fetched <= last['Fetched'][0]:
+                return False
+            segments = self._segments()
+            items = self._segment_items(segments[-1]) if segments else []
+            new_items = sorted(set(bazaar_cache) - set(items))
+            row = {
+                "Instant Buy": np.array([bazaar_cache.get(item, {}).get('Instant Buy', np.nan) for item in items + new_items], dtype=np.float64),
+                "Instant Sell": np.array([bazaar_cache.get(item, {}).get('Instant Sell', np.nan) for item in items + new_items], dtype=np.float64),
+                "Postcard": np.array([postcard_cost], dtype=np.float64),
+                "Fetched": np.array([fetched], dtype=np.float64)
+            }
+            if last is not None and not new_items and last['Items'] == items and all(
+                    np.array_equal(row[field], last[field], equal_nan=True) for field in ["Instant Buy", "Instant Sell", "Postcard"]):
+                return False
+
+            if new_items or not segments:
+                items = items + new_items
+                segment = f"{len(segments):04d}"
+                os.makedirs(os.path.join(self.path, segment), exist_ok=True)
+                temp_path = os.path.join(self.path, segment, "items.json.tmp")
+                with open(temp_path, "w") as file:
+                    json.dump(items, file)
+                os.replace(temp_path, os.path.join(self.path, segment, "items.json"))
+            else:
+                segment = segments[-1]
+
+            #Cut every field back to the complete snapshots before appending
+            directory = os.path.join(self.path, segment)
+            fetched_path = os.path.join(directory, FIELDS['Fetched'])
+            count = os.path.getsize(fetched_path) // 8 if os.path.exists(fetched_path) else 0
+            for field in ["Instant Buy", "Instant Sell", "Postcard", "Fetched"]:
+                field_path = os.path.join(directory, FIELDS[field])
+                size = count * len(row[field]) * 8 if field in ["Instant Buy", "Instant Sell"] else count * 8
+                if os.path.exists(field_path) and os.path.getsize(field_path) > size:
+                    os.truncate(field_path, size)
+
+            for field in ["Instant Buy", "Instant Sell", "Postcard", "Fetched"]:
+                with open(os.path.join(directory, FIELDS[field]), "ab") as file:
+                    file.write(row[field].tobytes())
+            return True
+
+    def load(self, items, start=None, end=None):
+        """
+        Reads the stored snapshots as price matrices over the given items.
+
+        Args:
+            items (list): Item IDs, e.g. a structure's 'Items'.
+            start, end (float, optional): Inclusive timestamp bounds.
+
+        Returns:
+            Dict: 'Fetched' and 'Postcard' arrays of shape (snapshots,), and 'Instant Buy' and 'Instant Sell'
+                arrays of shape (snapshots, items). Items missing from a snapshot are priced 0, as in price_vectors.
+        """
+        parts = []
+        for segment in self._segments():
+            segment_items = self._segment_items(segment)
+            data = self._read(segment, segment_items)
+            if data is None:
+                continue
+            keep = np.ones(len(data['Fetched']), dtype=bool)
+            if start is not None:
+                keep &= data['Fetched'] >= start
+            if end is not None:
+                keep &= data['Fetched'] <= end
+            if not keep.any():
+                continue
+
+            column = pd.Index(segment_items).get_indexer(items)
+            part = {"Fetched": np.asarray(data['Fetched'][keep]), "Postcard": np.asarray(data['Postcard'][keep])}
+            for field in ["Instant Buy", "Instant Sell"]:
+                prices = np.zeros((int(keep.sum()), len(items)))
+                prices[:, column >= 0] = data[field][keep][:, column[column >= 0]]
+                part[field] = np.nan_to_num(prices, nan=0)
+            parts.append(part)
+
+        if not parts:
+            return {
+                "Fetched": np.empty(0),
+                "Postcard": np.empty(0),
+                "Instant Buy": np.empty((0, len(items))),
+                "Instant Sell": np.empty((0, len(items)))
+            }
+        return {field: np.concatenate([part[field] for part in parts]) for field in parts[0]}
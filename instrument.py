@@ -0,0 +1,155 @@
+import os
+import io
+import sys
+import json
+import time
+import pstats
+import logging
+import cProfile
+import tracemalloc
+import contextlib
+
+PROFILE_DIR = os.path.join(".cache", "profiles")
+
+LOGGER = logging.getLogger("minion_calculator.build")
+if not LOGGER.handlers:
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    LOGGER.addHandler(_handler)
+    LOGGER.setLevel(logging.INFO)
+    LOGGER.propagate = False
+
+def profiled_stages():
+    """
+    Reads the stages to profile from the PROFILE_STAGES environment variable.
+
+    Returns:
+        set: Comma separated stage names, or '*' for every stage.
+    """
+    return {name.strip() for name in os.environ.get("PROFILE_STAGES", "").split(",") if name.strip()}
+
+def trace_memory(default=False):
+    """
+    Reads whether to trace memory from the TRACE_MEMORY environment variable ('1' or '0').
+
+    tracemalloc slows everything it traces several times over, so memory is only traced when asked for.
+
+    Args:
+        default (bool): Used when the variable is unset.
+
+    Returns:
+        bool: Whether to trace memory.
+    """
+    value = os.environ.get("TRACE_MEMORY")
+    return default if value is None else value == "1"
+
+class BuildTrace:
+    """
+    Records wall time, row counts and peak memory for each stage of a build, and logs them as one
+    JSON line when the build finishes.
+
+    Stages run one after another; a stage started inside another resets the outer stage's memory peak.
+    Peak memory is the highest traced allocation above the stage's starting point, covering both Python
+    objects and NumPy buffers.
+
+    Args:
+        name (str): The build being traced, e.g. 'create_final_df'.
+        memory (bool, optional): Trace allocations with tracemalloc, which slows allocation-heavy stages down.
+            Defaults to trace_memory().
+        profile (Iterable, optional): Stage names to run under cProfile, or '*' for all.
+            Defaults to the PROFILE_STAGES environment variable.
+    """
+    def __init__(self, name, memory=None, profile=None):
+        self.name = name
+        self.memory = trace_memory() if memory is None else memory
+        self.profile = set(profile) if profile is not None else profiled_stages()
+        self.stages = []
+        self.profiles = {}
+        self.started = None
+        self.seconds = None
+        self._started_tracing = False
+
+    def __enter__(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self.started = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.seconds = time.perf_counter() - self._start
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        LOGGER.info(json.dumps(self.report()))
+        return False
+
+    @contextlib.contextmanager
+    def stage(self, name, rows=None):
+        """
+        Times one stage. The yielded record's 'Rows' can be set inside the block once the output is known.
+
+        Args:
+            name (str): The stage name.
+            rows (int, optional): Rows the stage produces, if known up front.
+
+        Yields:
+            Dict: The stage record.
+        """
+        record = {"Stage": name, "Seconds": None, "Rows": rows, "Peak MB": None}
+        tracing = self.memory and tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        profiler = cProfile.Profile() if name in self.profile or "*" in self.profile else None
+
+        start = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        try:
+            yield record
+        finally:
+            if profiler:
+                profiler.disable()
+            record['Seconds'] = time.perf_counter() - start
+            if tracing:
+                record['Peak MB'] = (tracemalloc.get_traced_memory()[1] - baseline) / 1e6
+            if profiler:
+                self.profiles[name] = self._save_profile(name, profiler)
+            self.stages.append(record)
+
+    def add(self, name, seconds, rows=None):
+        """
+        Records a stage timed elsewhere, such as a price source fetched on another thread.
+
+        Args:
+            name (str): The stage name.
+            seconds (float): Its wall time.
+            rows (int, optional): Rows it produced.
+        """
+        self.stages.append({"Stage": name, "Seconds": seconds, "Rows": rows, "Peak MB": None})
+
+    def _save_profile(self, name, profiler):
+        """Dumps a stage's profile to PROFILE_DIR and returns its top functions by cumulative time."""
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profiler.dump_stats(os.path.join(PROFILE_DIR, f"{self.name}-{name}.prof".replace(" ", "_")))
+        text = io.StringIO()
+        pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(20)
+        return text.getvalue()
+
+    def report(self):
+        """
+        Returns the trace as a JSON-serializable dictionary.
+
+        Returns:
+            Dict: 'Build', 'Started' (timestamp), 'Seconds' (total wall time), 'Stages' (list of stage records)
+                and 'Profiled' (names of stages with a cProfile dump).
+        """
+        return {
+            "Build": self.name,
+            "Started": self.started,
+            "Seconds": self.seconds,
+            "Stages": self.stages,
+            "Profiled": list(self.profiles)
+        }
@@ -0,0 +1,129 @@
+import itertools
+import numpy as np
+import pandas as pd
+
+from engine import misc_mask, misc_combo, MISC_UPGRADES
+from query import frontier
+
+ISLAND_UPGRADES = ["Floating Crystal", "Beacon", "Power Crystal"]
+SETUP_COLUMNS = ['Minion', 'Tier', 'Fuel', 'Upgrade 1', 'Upgrade 2']
+
+def knapsack(cost, profit, slots, budget, resolution=2000):
+    """
+    Picks candidates, each as many times as wanted, for the most total profit within a slot count and a budget.
+
+    The budget is split into resolution units and costs are rounded up to whole units, so the answer never
+    exceeds the budget; it may miss a better pick that only fits unrounded. Each slot is one vectorized
+    step over every candidate and budget unit.
+
+    Args:
+        cost, profit (np.ndarray): One value per candidate.
+        slots (int): Most candidates picked.
+        budget (float): Most total cost.
+        resolution (int): Budget units.
+
+    Returns:
+        np.ndarray: How many times each candidate is picked.
+    """
+    counts = np.zeros(len(cost), dtype=int)
+    unit = budget / resolution if budget > 0 else 1
+    weight = np.ceil(cost / unit - 1e-9).astype(int)
+    usable = np.flatnonzero((profit > 0) & (weight <= (resolution if budget > 0 else 0)))
+    if not len(usable) or slots <= 0:
+        return counts
+    weight, gain = weight[usable], profit[usable]
+
+    #best[b] is the most profit from the slots so far with at most b units spent
+    units = np.arange(resolution + 1)
+    remaining = units - weight[:, None]
+    best = np.zeros(resolution + 1)
+    choices = []
+    for _ in range(int(slots)):
+        totals = np.where(remaining >= 0, best[np.maximum(remaining, 0)], -np.inf) + gain[:, None]
+        pick = totals.argmax(axis=0)
+        total = totals[pick, units]
+        improved = total > best
+        if not improved.any():
+            break
+        choices.append(np.where(improved, pick, -1))
+        best = np.where(improved, total, best)
+
+    spent = resolution
+    for choice in reversed(choices):
+        if choice[spent] >= 0:
+            counts[usable[choice[spent]]] += 1
+            spent -= weight[choice[spent]]
+    return counts
+
+def optimize(table, rows, slots, budget, misc_upgrades=MISC_UPGRADES, resolution=2000):
+    """
+    Finds the setups to place in a number of minion slots for the most combined daily profit within a budget.
+
+    Island upgrades (Floating Crystal, Beacon, Power Crystal) are bought once and apply to every minion, so
+    each affordable island combo is tried in turn; the per-minion upgrades are chosen per setup. For each
+    island combo, the candidates are the (Cost, Profit) frontier rows of every per-minion combo, and since a
+    setup can fill several slots, dominated candidates never help and the frontier is all the solver sees.
+
+    Args:
+        table (SetupTable): The table from create_final_df.
+        rows (np.ndarray): Row positions to choose from, e.g. from SetupTable.filter.
+        slots (int): Minion slots to fill.
+        budget (float): Coins to spend, including the island upgrades.
+        misc_upgrades (Iterable): Miscellaneous upgrades available to buy.
+        resolution (int): Budget units, see knapsack.
+
+    Returns:
+        Dict: 'Island Upgrades' (sorted names), 'Island Cost', 'Profit' (combined daily profit), 'Cost' (total
+            spent) and 'Setups', a DataFrame with one row per chosen setup: its labels, per-minion 'Misc Upgrades',
+            'Count', and 'Profit' and 'Cost' of one such minion excluding the island upgrades.
+    """
+    available = set(misc_upgrades)
+    island_names = [name for name in ISLAND_UPGRADES if name in available]
+    minion_names = [name for name in MISC_UPGRADES if name in available and name not in ISLAND_UPGRADES]
+    def subsets(names):
+        return [combo for r in range(len(names) + 1) for combo in itertools.combinations(names, r)]
+
+    best = {
+        "Island Upgrades": [],
+        "Island Cost": 0,
+        "Profit": 0,
+        "Cost": 0,
+        "Setups": pd.DataFrame(columns=SETUP_COLUMNS + ['Misc Upgrades', 'Count', 'Profit', 'Cost'])
+    }
+    for island in subsets(island_names):
+        island_mask = misc_mask(island)
+        if island_mask not in table.effects.index:
+            continue
+        island_cost, island_daily = table.effects.loc[island_mask, ['Cost', 'Daily Cost']]
+        if island_cost > budget:
+            continue
+
+        parts = []
+        for extras in subsets(minion_names):
+            combo = island + extras
+            if misc_mask(combo) not in table.effects.index:
+                continue
+            candidates = table.pareto(rows, combo)
+            values = table.values(candidates, combo)
+            parts.append(pd.DataFrame({
+                "Row": candidates,
+                "Misc Upgrades": [misc_combo(misc_mask(extras))] * len(candidates),
+                "Profit": values['Profit'] + island_daily,
+                "Cost": values['Cost'] - island_cost
+            }))
+        candidates = pd.concat(parts, ignore_index=True)
+        candidates = candidates.iloc[frontier(candidates['Cost'].to_numpy(), candidates['Profit'].to_numpy())]
+
+        counts = knapsack(candidates['Cost'].to_numpy(), candidates['Profit'].to_numpy(), slots, budget - island_cost, resolution)
+        chosen = candidates[counts > 0].assign(Count=counts[counts > 0])
+        profit = (chosen['Profit'] * chosen['Count']).sum() - (island_daily if len(chosen) else 0)
+        if profit > best['Profit']:
+            setups = table.df.iloc[chosen['Row'].to_numpy()][SETUP_COLUMNS].reset_index(drop=True)
+            best = {
+                "Island Upgrades": list(misc_combo(island_mask)),
+                "Island Cost": island_cost,
+                "Profit": profit,
+                "Cost": (chosen['Cost'] * chosen['Count']).sum() + island_cost,
+                "Setups": pd.concat([setups, chosen[['Misc Upgrades', 'Count', 'Profit', 'Cost']].reset_index(drop=True)], axis=1)
+            }
+    return best
@@ -0,0 +1,222 @@
+import os
+import json
+import time
+import threading
+import functools
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
+from history import PriceHistory, HISTORY_DIR
+
+BAZAAR_URL = "https://api.hypixel.net/v2/skyblock/bazaar"
+POSTCARD_URL = "https://sky.coflnet.com/api/auctions/tag/POSTCARD/active/bin"
+SNAPSHOT_PATH = os.path.join(".cache", "prices.json")
+
+def parse_bazaar(payload):
+    """
+    Converts a Hypixel bazaar response into the bazaar cache used throughout the calculator.
+
+    Args:
+        payload (Dict): The decoded bazaar endpoint response.
+
+    Returns:
+        Dict: A cache mapping item IDs to their 'Instant Sell' and 'Instant Buy' prices.
+    """
+    return {
+        k: {
+            "Instant Sell": v["quick_status"]["sellPrice"],
+            "Instant Buy": v["quick_status"]["buyPrice"]
+        }
+        for k, v in payload['products'].items()
+    }
+
+def parse_postcard(payload):
+    """
+    Extracts the cheapest Postcard BIN from a Coflnet active auctions response.
+
+    Args:
+        payload (list): The decoded auctions endpoint response.
+
+    Returns:
+        float: The starting bid of the first auction, or 0 if there are no active BINs.
+    """
+    return payload[0]['startingBid'] if payload else 0
+
+SOURCES = {
+    "Bazaar": (BAZAAR_URL, parse_bazaar),
+    "Postcard": (POSTCARD_URL, parse_postcard)
+}
+FALLBACKS = {
+    "Postcard": 0
+}
+
+class PriceProvider:
+    """
+    Fetches every price source once per refresh and shares the result.
+
+    Sources are fetched concurrently over one pooled session and revalidated with ETag/Last-Modified
+    headers. The last good snapshot is persisted to disk, so a restart can start warm and an outage
+    falls back to the previous prices instead of failing the build. Every fresh bazaar snapshot is also
+    appended to the price history.
+
+    Args:
+        sources (Dict, optional): Maps source names to an http(s) URL or a local JSON file path.
+            Defaults to the live Hypixel and Coflnet endpoints.
+        snapshot_path (str, optional): Where the last snapshot is persisted. None disables persistence.
+        timeout (float): Per-request timeout in seconds.
+        history_path (str, optional): The PriceHistory directory. None disables the history.
+    """
+    def __init__(self, sources=None, snapshot_path=SNAPSHOT_PATH, timeout=10, history_path=HISTORY_DIR):
+        self.sources = {name: url for name, (url, parse) in SOURCES.items()}
+        self.sources.update(sources or {})
+        self.snapshot_path = snapshot_path
+        self.timeout = timeout
+        self.history = PriceHistory(history_path) if history_path else None
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.sources), pool_maxsize=len(self.sources))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._lock = threading.Lock()
+        self._snapshot = self._load_snapshot()
+        self._served = False
+
+    def _load_snapshot(self):
+        """Reads the persisted snapshot, or an empty one if there is none."""
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return {"Fetched": 0, "Sources": {}}
+        try:
+            with open(self.snapshot_path, "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {"Fetched": 0, "Sources": {}}
+
+    def _save_snapshot(self, snapshot):
+        """Atomically replaces the persisted snapshot."""
+        if not self.snapshot_path:
+            return
+        os.makedirs(os.path.dirname(self.snapshot_path) or ".", exist_ok=True)
+        temp_path = self.snapshot_path + ".tmp"
+        with open(temp_path, "w") as file:
+            json.dump(snapshot, file)
+        os.replace(temp_path, self.snapshot_path)
+
+    def _fetch_source(self, name, previous):
+        """
+        Fetches and parses one source, reusing the previous value on a 304 or an error.
+
+        Returns:
+            Tuple of the source entry ('Value', 'ETag', 'Last-Modified', 'Fetched') and whether it is stale.
+        """
+        location = self.sources[name]
+        parse = SOURCES[name][1]
+        try:
+            if not location.startswith(("http://", "https://")):
+                with open(location, "r") as file:
+                    return {"Value": parse(json.load(file)), "Fetched": time.time()}, False
+
+            headers = {}
+            if previous.get('ETag'):
+                headers['If-None-Match'] = previous['ETag']
+            if previous.get('Last-Modified'):
+                headers['If-Modified-Since'] = previous['Last-Modified']
+            response = self.session.get(location, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and 'Value' in previous:
+                return {**previous, "Fetched": time.time()}, False
+            response.raise_for_status()
+            return {
+                "Value": parse(response.json()),
+                "ETag": response.headers.get('ETag'),
+                "Last-Modified": response.headers.get('Last-Modified'),
+                "Fetched": time.time()
+            }, False
+        except (requests.RequestException, OSError, ValueError, KeyError, IndexError, TypeError):
+            if 'Value' in previous:
+                return previous, True
+            if name in FALLBACKS:
+                return {"Value": FALLBACKS[name], "Fetched": 0}, True
+            raise
+
+    def fetch(self, max_age=0):
+        """
+        Returns current prices for every source, fetching them concurrently.
+
+        Args:
+            max_age (float): Reuse the last snapshot without any request if it is younger than this many seconds
+                and every source in it was fetched fresh.
+
+        Returns:
+            Dict: 'Bazaar' (bazaar cache), 'Postcard' (cost), 'Fetched' (timestamp), 'Stale'
+                (names of sources served from the previous snapshot after a failed fetch) and 'Seconds'
+                (each source's fetch time, empty when the snapshot was reused).
+        """
+        with self._lock:
+            snapshot = self._snapshot
+            #A snapshot holding stale sources is never reused, so the next call retries them
+            if snapshot['Sources'] and not snapshot.get('Stale') and time.time() - snapshot['Fetched'] < max_age:
+                self._served = True
+                return self._result(snapshot, [], {})
+
+            seconds = {}
+            def timed_fetch(name):
+                start = time.perf_counter()
+                entry, is_stale = self._fetch_source(name, snapshot['Sources'].get(name, {}))
+                seconds[name] = time.perf_counter() - start
+                return entry, is_stale
+
+            names = list(self.sources)
+            with ThreadPoolExecutor(max_workers=len(names)) as executor:
+                results = list(executor.map(timed_fetch, names))
+
+            stale = [name for name, (entry, is_stale) in zip(names, results) if is_stale]
+            snapshot = {"Fetched": time.time(), "Stale": stale, "Sources": {name: entry for name, (entry, is_stale) in zip(names, results)}}
+            self._snapshot = snapshot
+            self._served = True
+            if len(stale) < len(names):
+                self._save_snapshot(snapshot)
+            if self.history is not None and "Bazaar" not in stale:
+                self.history.append(snapshot['Sources']['Bazaar']['Value'], snapshot['Fetched'], snapshot['Sources']['Postcard']['Value'])
+
+        return self._result(snapshot, stale, {name: seconds[name] for name in names})
+
+    def latest(self):
+        """
+        Returns the prices fetch last served without any request, fetching first only if it hasn't served any.
+        For reading another value, such as the Postcard cost, from the same snapshot as an earlier fetch.
+
+        Returns:
+            Dict: See fetch, with empty 'Seconds'.
+        """
+        with self._lock:
+            snapshot = self._snapshot if self._served else None
+        if snapshot is None:
+            return self.fetch()
+        return self._result(snapshot, list(snapshot.get('Stale', [])), {})
+
+    def _result(self, snapshot, stale, seconds):
+        """Flattens a snapshot into the dictionary returned by fetch."""
+        result = {name: entry['Value'] for name, entry in snapshot['Sources'].items()}
+        result['Fetched'] = snapshot['Fetched']
+        result['Stale'] = stale
+        result['Seconds'] = seconds
+        return result
+
+@functools.lru_cache(maxsize=1)
+def get_provider():
+    """
+    Returns the process-wide price provider.
+
+    The BAZAAR_SOURCE and POSTCARD_SOURCE environment variables replace the live endpoints with
+    a local fixture server URL or a JSON file path.
+
+    Returns:
+        PriceProvider: The shared provider.
+    """
+    sources = {}
+    if os.environ.get("BAZAAR_SOURCE"):
+        sources['Bazaar'] = os.environ["BAZAAR_SOURCE"]
+    if os.environ.get("POSTCARD_SOURCE"):
+        sources['Postcard'] = os.environ["POSTCARD_SOURCE"]
+    return PriceProvider(sources)
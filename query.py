@@ -0,0 +1,488 @@
+import uuid
+import threading
+import numpy as np
+from collections import OrderedDict
+
+from engine import evaluate_combo, combo_values, misc_mask, misc_combo
+
+LABEL_COLUMNS = ['Minion', 'Fuel', 'Upgrade 1', 'Upgrade 2']
+COMBO_INPUTS = ['Speed Mod', 'Speed', 'CPA', 'Flat', 'Daily Cost', 'Cost', 'Mob Penalty', 'Crystal Penalty']
+RANKINGS = {
+    "Profit": False,
+    "ROI": True,
+    "Cost": True
+}
+SORT_COLUMNS = ['Minion', 'Tier', 'Fuel', 'Upgrade 1', 'Upgrade 2', 'Profit', 'Cost', 'ROI']
+
+def _postings(codes, n_values):
+    """
+    Builds a posting list index: the sorted row positions holding each value.
+
+    Args:
+        codes (np.ndarray): Integer value of each row, between 0 and n_values - 1.
+        n_values (int): Number of distinct values.
+
+    Returns:
+        Dict: 'Rows', all row positions grouped by value, and 'Bounds', where value v's rows are
+            Rows[Bounds[v]:Bounds[v + 1]].
+    """
+    order = np.argsort(codes, kind='stable').astype(np.int32)
+    return {
+        "Rows": order,
+        "Bounds": np.searchsorted(codes[order], np.arange(n_values + 1))
+    }
+
+def _count(postings, values):
+    """
+    Returns how many rows hold any of the given values, without materializing them.
+    """
+    values = np.asarray(values, dtype=int)
+    return int((postings['Bounds'][values + 1] - postings['Bounds'][values]).sum())
+
+def _union(postings, values):
+    """
+    Returns the sorted row positions holding any of the given values.
+    """
+    parts = [postings['Rows'][postings['Bounds'][v]:postings['Bounds'][v + 1]] for v in values]
+    if not parts:
+        return np.empty(0, dtype=np.int32)
+    return np.sort(np.concatenate(parts)) if len(parts) > 1 else parts[0]
+
+def _rank(order):
+    """
+    Inverts a row permutation: each row's place in the order.
+    """
+    rank = np.empty(len(order), dtype=np.int32)
+    rank[order] = np.arange(len(order), dtype=np.int32)
+    return rank
+
+def build_indexes(df):
+    """
+    Builds the filter indexes for a compact setup frame, once per cached frame.
+
+    Args:
+        df (pd.DataFrame): A compact frame from add_misc_flags.
+
+    Returns:
+        Dict: Posting lists for the label columns and Tier, plus the row permutation that sorts Cost
+            ('Cost Order'), the sorted costs ('Sorted Cost') and each row's place in that order ('Cost Rank').
+            Tier's posting lists sort the rows by tier, so they also hold each row's place in that order ('Rank').
+    """
+    indexes = {
+        column: _postings(df[column].cat.codes.to_numpy(), len(df[column].cat.categories))
+        for column in LABEL_COLUMNS
+    }
+    tiers = df['Tier'].to_numpy()
+    indexes['Tier'] = _postings(tiers, int(tiers.max()) + 1 if len(tiers) else 1)
+    indexes['Tier']['Rank'] = _rank(indexes['Tier']['Rows'])
+
+    cost = df['Cost'].to_numpy()
+    order = np.argsort(cost, kind='stable').astype(np.int32)
+    indexes['Cost Order'] = order
+    indexes['Sorted Cost'] = cost[order]
+    indexes['Cost Rank'] = _rank(order)
+    return indexes
+
+def sorted_frontier(cost, profit):
+    """
+    Finds the candidates not dominated on (cost, profit) among candidates already ordered by cost: no other
+    candidate is at most as expensive and at least as profitable while being strictly better in one.
+
+    Keeps each candidate that beats the best profit of every one before it, then of several kept at the same
+    cost only the last, most profitable one.
+
+    Args:
+        cost, profit (np.ndarray): One value per candidate, cost ascending.
+
+    Returns:
+        np.ndarray: Indexes of the undominated candidates, cheapest first.
+    """
+    best_before = np.concatenate(([-np.inf], np.maximum.accumulate(profit)[:-1]))
+    kept = np.flatnonzero(profit > best_before)
+    return kept[np.append(cost[kept][1:] != cost[kept][:-1], True)]
+
+def frontier(cost, profit):
+    """
+    Finds the candidates not dominated on (cost, profit) in any order, see sorted_frontier.
+
+    Args:
+        cost, profit (np.ndarray): One value per candidate.
+
+    Returns:
+        np.ndarray: Indexes of the undominated candidates, cheapest first.
+    """
+    order = np.lexsort((-profit, cost))
+    return order[sorted_frontier(cost[order], profit[order])]
+
+class SetupTable:
+    """
+    The cached base setup frame with its miscellaneous combo effects and filter indexes.
+
+    Filters first take the candidate rows from the most selective index (a whitelist's posting lists,
+    the tier range or a binary search on the cost order) and then check the remaining criteria on those
+    candidates only, so the work grows with the result rather than the table.
+
+    Args:
+        df (pd.DataFrame): A compact frame from add_misc_flags.
+        effects (pd.DataFrame): The effect table from combo_effects.
+    """
+    def __init__(self, df, effects):
+        self.df = df
+        self.effects = effects
+        self.generation = uuid.uuid4().hex
+        self.indexes = build_indexes(df)
+        self._codes = {column: df[column].cat.codes.to_numpy() for column in LABEL_COLUMNS}
+        self._tiers = df['Tier'].to_numpy()
+        self._cost = df['Cost'].to_numpy()
+        self._inputs = {column: df[column].to_numpy() for column in COMBO_INPUTS}
+
+    def __len__(self):
+        return len(self.df)
+
+    def _lookup(self, column, names):
+        """Converts label names into category codes, ignoring unknown names."""
+        codes = self.df[column].cat.categories.get_indexer(list(names))
+        return codes[codes >= 0]
+
+    def _allowed(self, column, whitelist, blacklist):
+        """Builds a boolean table over a label column's codes for its whitelist and blacklist."""
+        n_values = len(self.df[column].cat.categories)
+        if whitelist:
+            allowed = np.zeros(n_values, dtype=bool)
+            allowed[self._lookup(column, whitelist)] = True
+        else:
+            allowed = np.ones(n_values, dtype=bool)
+        allowed[self._lookup(column, blacklist)] = False
+        return allowed
+
+    def filter(self, minion_whitelist=(), minion_blacklist=(), tier_range=None, fuel_whitelist=(), fuel_blacklist=(),
+               upgrade_whitelist=(), upgrade_blacklist=(), cost_range=None, misc_upgrades=()):
+        """
+        Finds the rows matching the sidebar filter criteria.
+
+        Args:
+            minion_whitelist, minion_blacklist (Iterable): Minion names.
+            tier_range (tuple, optional): Inclusive (lowest, highest) tier.
+            fuel_whitelist, fuel_blacklist (Iterable): Fuel names.
+            upgrade_whitelist (Iterable): With one upgrade, either slot may hold it; with several, both slots must.
+            upgrade_blacklist (Iterable): Upgrades neither slot may hold.
+            cost_range (tuple, optional): Inclusive (lowest, highest) craft cost including the misc combo.
+            misc_upgrades (Iterable): Miscellaneous upgrade names.
+
+        Returns:
+            np.ndarray: Sorted positions of matching base rows. Empty if the misc combo can't be built.
+        """
+        mask = misc_mask(misc_upgrades)
+        if mask not in self.effects.index:
+            return np.empty(0, dtype=np.int32)
+        combo_cost = self.effects.loc[mask, 'Cost']
+        upgrade_whitelist = set(upgrade_whitelist)
+
+        candidates = [(len(self.df), lambda: np.arange(len(self.df), dtype=np.int32))]
+        def add_union(column, codes):
+            candidates.append((_count(self.indexes[column], codes), lambda: _union(self.indexes[column], codes)))
+
+        if minion_whitelist:
+            add_union('Minion', self._lookup('Minion', minion_whitelist))
+        if fuel_whitelist:
+            add_union('Fuel', self._lookup('Fuel', fuel_whitelist))
+        if upgrade_whitelist:
+            codes = self._lookup('Upgrade 1', upgrade_whitelist)
+            if len(upgrade_whitelist) == 1:
+                first, second = self.indexes['Upgrade 1'], self.indexes['Upgrade 2']
+                candidates.append((_count(first, codes) + _count(second, codes), lambda: np.union1d(_union(first, codes), _union(second, codes))))
+            else:
+                add_union('Upgrade 1', codes)
+                add_union('Upgrade 2', codes)
+        if tier_range:
+            n_tiers = len(self.indexes['Tier']['Bounds']) - 1
+            add_union('Tier', np.arange(max(tier_range[0], 0), min(tier_range[1] + 1, n_tiers)))
+        if cost_range:
+            #Widened search; the exact bounds are rechecked on the candidates below
+            slack = 1e-9 * (abs(cost_range[0]) + abs(cost_range[1]) + abs(combo_cost) + 1)
+            low = np.searchsorted(self.indexes['Sorted Cost'], cost_range[0] - combo_cost - slack, side='left')
+            high = np.searchsorted(self.indexes['Sorted Cost'], cost_range[1] - combo_cost + slack, side='right')
+            candidates.append((high - low, lambda: np.sort(self.indexes['Cost Order'][low:high])))
+
+        size, build = min(candidates, key=lambda candidate: candidate[0])
+        rows = build()
+
+        keep = np.ones(len(rows), dtype=bool)
+        if minion_whitelist or minion_blacklist:
+            keep &= self._allowed('Minion', minion_whitelist, minion_blacklist)[self._codes['Minion'][rows]]
+        if fuel_whitelist or fuel_blacklist:
+            keep &= self._allowed('Fuel', fuel_whitelist, fuel_blacklist)[self._codes['Fuel'][rows]]
+        if tier_range:
+            tiers = self._tiers[rows]
+            keep &= (tiers >= tier_range[0]) & (tiers <= tier_range[1])
+        if upgrade_whitelist or upgrade_blacklist:
+            upgrade_1 = self._codes['Upgrade 1'][rows]
+            upgrade_2 = self._codes['Upgrade 2'][rows]
+        if upgrade_whitelist:
+            listed = self._allowed('Upgrade 1', upgrade_whitelist, ())
+            if len(upgrade_whitelist) == 1:
+                keep &= listed[upgrade_1] | listed[upgrade_2]
+            else:
+                keep &= listed[upgrade_1] & listed[upgrade_2]
+        if upgrade_blacklist:
+            blocked = ~self._allowed('Upgrade 1', (), upgrade_blacklist)
+            keep &= ~(blocked[upgrade_1] | blocked[upgrade_2])
+        if cost_range:
+            cost = self._cost[rows] + combo_cost
+            keep &= (cost >= cost_range[0]) & (cost <= cost_range[1])
+        return rows[keep]
+
+    def _combo(self, misc_upgrades):
+        """Returns the combo bitmask, or None if the combo can't be built."""
+        mask = misc_mask(misc_upgrades)
+        return mask if mask in self.effects.index else None
+
+    def _values(self, rows, mask):
+        """Computes the combo stats of the given rows from the cached column arrays."""
+        return combo_values({column: values[rows] for column, values in self._inputs.items()}, mask, self.effects)
+
+    def _index_sorted(self, rows, key, order, rank):
+        """
+        Orders rows by a presorted column, ties by position. Large row sets are bucketed by their
+        place in the column's presorted order instead of being sorted.
+        """
+        if len(rows) * 64 < len(self.df):
+            return rows[np.argsort(key[rows], kind='stable')]
+        selected = np.zeros(len(self.df), dtype=bool)
+        selected[rank[rows]] = True
+        return order[selected]
+
+    def _cost_sorted(self, rows):
+        """
+        Orders rows by cost, ties by position. Misc combos add the same cost to every row, so the
+        presorted cost index holds for any combo.
+        """
+        return self._index_sorted(rows, self._cost, self.indexes['Cost Order'], self.indexes['Cost Rank'])
+
+    def top_k(self, rows, k=10, by='Profit', misc_upgrades=()):
+        """
+        Finds the best k rows by one measure without sorting the rest.
+
+        Args:
+            rows (np.ndarray): Row positions, e.g. from filter.
+            k (int): Number of rows to return.
+            by (str): 'Profit' (highest first), 'ROI' (fewest days first) or 'Cost' (cheapest first).
+            misc_upgrades (Iterable): Miscellaneous upgrade names.
+
+        Returns:
+            np.ndarray: Positions of the best rows in ranked order, ties by position.
+        """
+        mask = self._combo(misc_upgrades)
+        if mask is None or k <= 0:
+            return rows[:0]
+        if by == 'Cost':
+            return self._cost_sorted(rows)[:k]
+
+        key = self._values(rows, mask)[by]
+        if not RANKINGS[by]:
+            key = -key
+        #Every row tied with the kth is kept before the tie-break, or argpartition would pick among them arbitrarily
+        best = np.flatnonzero(key <= np.partition(key, k - 1)[k - 1]) if k < len(rows) else np.arange(len(rows))
+        return rows[best[np.lexsort((rows[best], key[best]))]][:k]
+
+    def pareto(self, rows, misc_upgrades=()):
+        """
+        Finds the rows not dominated on (Cost, Profit): no other row is at most as expensive and at
+        least as profitable while being strictly better in one.
+
+        Orders the rows by cost with the presorted cost index and walks them once, see sorted_frontier.
+
+        Args:
+            rows (np.ndarray): Row positions, e.g. from filter.
+            misc_upgrades (Iterable): Miscellaneous upgrade names.
+
+        Returns:
+            np.ndarray: Positions of the frontier rows, cheapest first.
+        """
+        mask = self._combo(misc_upgrades)
+        if mask is None or not len(rows):
+            return rows[:0]
+        ordered = self._cost_sorted(rows)
+        return ordered[sorted_frontier(self._cost[ordered], self._values(ordered, mask)['Profit'])]
+
+    def sort_page(self, rows, by=None, ascending=True, page=0, page_size=100, misc_upgrades=()):
+        """
+        Finds one page of rows in sorted order without sorting, or evaluating, more than the page needs.
+
+        Cost and Tier sorts read the presorted indexes. Profit, ROI and label sorts compute one key per row
+        and partially select up to the end of the page, so only the rows up to it are sorted.
+
+        Args:
+            rows (np.ndarray): Row positions, e.g. from filter, top_k or pareto.
+            by (str, optional): One of SORT_COLUMNS; labels sort alphabetically. None keeps the given order.
+            ascending (bool): Sort direction. Ties are by position in the sort direction.
+            page (int): Zero-based page number.
+            page_size (int): Rows per page.
+            misc_upgrades (Iterable): Miscellaneous upgrade names, for Profit and ROI.
+
+        Returns:
+            np.ndarray: Positions of the page's rows in order.
+        """
+        start, stop = page * page_size, (page + 1) * page_size
+        if by is None or start >= len(rows):
+            return rows[start:stop]
+        if by in ('Cost', 'Tier'):
+            if by == 'Cost':
+                ordered = self._cost_sorted(rows)
+            else:
+                ordered = self._index_sorted(rows, self._tiers, self.indexes['Tier']['Rows'], self.indexes['Tier']['Rank'])
+            return ordered[start:stop] if ascending else ordered[::-1][start:stop]
+
+        if by in LABEL_COLUMNS:
+            categories = self.df[by].cat.categories
+            key = _rank(np.argsort(np.asarray(categories, dtype=str), kind='stable'))[self._codes[by][rows]]
+        else:
+            mask = self._combo(misc_upgrades)
+            if mask is None:
+                return rows[:0]
+            key = self._values(rows, mask)[by]
+        if not ascending:
+            key = -key.astype(np.float64)
+            tie = -rows.astype(np.int64)
+        else:
+            tie = rows
+        #Every row tied with the page's last key is kept, so ties split across pages consistently
+        best = np.flatnonzero(key <= np.partition(key, stop - 1)[stop - 1]) if stop < len(rows) else np.arange(len(rows))
+        return rows[best[np.lexsort((tie[best], key[best]))]][start:stop]
+
+    def values(self, rows, misc_upgrades=()):
+        """
+        Computes the combo stats of the given rows without building a frame.
+
+        Args:
+            rows (np.ndarray): Row positions, e.g. from filter.
+            misc_upgrades (Iterable): Miscellaneous upgrade names.
+
+        Returns:
+            Dict: See combo_values. Empty arrays if the combo can't be built.
+        """
+        mask = self._combo(misc_upgrades)
+        if mask is None:
+            mask, rows = 0, rows[:0]
+        return self._values(rows, mask)
+
+    def evaluate(self, rows, misc_upgrades=()):
+        """
+        Applies a miscellaneous upgrade combo to the given rows.
+
+        Args:
+            rows (np.ndarray): Row positions, e.g. from filter.
+            misc_upgrades (Iterable): Miscellaneous upgrade names.
+
+        Returns:
+            pd.DataFrame: See evaluate_combo.
+        """
+        mask = self._combo(misc_upgrades)
+        if mask is None:
+            mask, rows = 0, rows[:0]
+        return evaluate_combo(self.df.iloc[rows], mask, self.effects)
+
+def query_key(minion_whitelist=(), minion_blacklist=(), tier_range=None, fuel_whitelist=(), fuel_blacklist=(),
+              upgrade_whitelist=(), upgrade_blacklist=(), cost_range=None, misc_upgrades=(), view="all", by=None, k=None):
+    """
+    Builds the canonical cache key of a query, so equivalent criteria share one entry.
+
+    Args:
+        minion_whitelist ... misc_upgrades: See SetupTable.filter.
+        view (str): 'all', 'top' or 'pareto'.
+        by (str, optional): The top_k ranking; ignored for other views.
+        k (int, optional): The top_k count; ignored for other views.
+
+    Returns:
+        tuple: Name lists as sorted tuples, ranges as floats and the misc combo as its sorted tuple.
+    """
+    def names(values):
+        return tuple(sorted(set(values)))
+    def bounds(values):
+        return None if values is None else tuple(float(value) for value in values)
+    return (
+        names(minion_whitelist), names(minion_blacklist), bounds(tier_range),
+        names(fuel_whitelist), names(fuel_blacklist), names(upgrade_whitelist), names(upgrade_blacklist),
+        bounds(cost_range), misc_combo(misc_mask(misc_upgrades)),
+        view, by if view == "top" else None, int(k) if view == "top" else None
+    )
+
+class ResultCache:
+    """
+    A bounded LRU cache of query results (row position arrays) for one SetupTable build at a time.
+
+    Every lookup names the table's generation; a new one means the table was rebuilt, and the cache
+    empties itself before answering. Safe to share between threads and sessions, and cached arrays are
+    read-only so a caller can't alter another's result.
+
+    Args:
+        maxsize (int): Most results kept.
+    """
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.generation = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _sync(self, generation):
+        """Empties the cache when the table generation changes. Call with the lock held."""
+        if generation != self.generation:
+            self._entries.clear()
+            self.generation = generation
+
+    def get(self, generation, key):
+        """
+        Returns the cached result for a key, or None, counting a hit or a miss.
+        """
+        with self._lock:
+            self._sync(generation)
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, generation, key, rows):
+        """
+        Stores a result, evicting the least recently used ones beyond maxsize.
+        """
+        rows = np.asarray(rows).view()
+        rows.flags.writeable = False
+        with self._lock:
+            self._sync(generation)
+            self._entries[key] = rows
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return rows
+
+    def get_or_compute(self, generation, key, compute):
+        """
+        Returns the cached result for a key, computing and storing it on a miss.
+
+        Args:
+            generation (str): The table's generation.
+            key (tuple): From query_key.
+            compute (Callable): Computes the rows without arguments.
+
+        Returns:
+            np.ndarray: The read-only rows.
+        """
+        rows = self.get(generation, key)
+        if rows is None:
+            rows = self.put(generation, key, compute())
+        return rows
+
+    def stats(self):
+        """
+        Returns:
+            Dict: 'Hits', 'Misses', 'Size' and 'Generation'.
+        """
+        with self._lock:
+            return {"Hits": self.hits, "Misses": self.misses, "Size": len(self._entries), "Generation": self.generation}
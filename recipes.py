@@ -0,0 +1,209 @@
+import heapq
+import functools
+import threading
+
+from functions import load_data
+
+def build_recipes(minions, fuels, upgrades):
+    """
+    Collects every known way to craft an ingredient.
+
+    Enchanted items are crafted from the raw drop named alongside them, and fuels from their 'Recipe'.
+
+    Args:
+        minions (Dict): The raw minion dictionaries.
+        fuels (Dict): The raw fuel dictionaries.
+        upgrades (Dict): The raw upgrade dictionaries.
+
+    Returns:
+        Dict: Maps item IDs to a list of alternative recipes. Each recipe maps ingredients to quantities;
+            the ingredient "Coins" is a constant cost.
+    """
+    recipes = {}
+    def add(output, recipe):
+        #Drops that are already enchanted list themselves, which isn't a recipe
+        if output in recipe:
+            return
+        if recipe not in recipes.setdefault(output, []):
+            recipes[output].append(recipe)
+
+    for owner in list(minions.values()) + list(upgrades.values()):
+        for drop in owner.get('Drops', []):
+            for enchanted_id, amount in drop['Enchanted'].items():
+                add(enchanted_id, {drop['Item']: amount})
+
+    for name, fuel in fuels.items():
+        if fuel.get('Recipe'):
+            add(name, {item['Item']: item['Amount'] for item in fuel['Recipe']})
+
+    return recipes
+
+class RecipeResolver:
+    """
+    Finds the cheapest way to obtain every item in the recipe graph: buying it at Instant Sell, or
+    crafting it from its cheapest ingredients.
+
+    Costs are memoized for the whole catalog, so shared ingredients such as enchanted materials are
+    solved once per price snapshot. Later snapshots only revisit items whose price changed and the
+    recipes that use them, stopping wherever a cost comes out unchanged.
+
+    Items with neither a price nor a recipe cost 0, as in price_data, and are never chosen over a priced
+    alternative.
+
+    Args:
+        recipes (Dict): From build_recipes.
+
+    Raises:
+        ValueError: If the recipes contain a cycle.
+    """
+    def __init__(self, recipes):
+        self.recipes = recipes
+        self.users = {}
+        for output, alternatives in recipes.items():
+            for recipe in alternatives:
+                for ingredient in recipe:
+                    if ingredient != "Coins":
+                        self.users.setdefault(ingredient, set()).add(output)
+
+        self.order = self._topological_order()
+        self.rank = {node: i for i, node in enumerate(self.order)}
+        self.prices = {}
+        self.costs = {}
+        self.routes = {}
+        self.complete = {}
+        self._lock = threading.Lock()
+
+    def _topological_order(self):
+        """Orders every node after all of its ingredients."""
+        nodes = set(self.recipes) | set(self.users)
+        pending = {node: sum(1 for recipe in self.recipes.get(node, []) for ingredient in set(recipe) if ingredient != "Coins") for node in nodes}
+        ready = sorted(node for node, count in pending.items() if count == 0)
+        order = []
+        while ready:
+            node = ready.pop()
+            order.append(node)
+            for user in sorted(self.users.get(node, ())):
+                pending[user] -= sum(1 for recipe in self.recipes[user] if node in recipe)
+                if pending[user] == 0:
+                    ready.append(user)
+        if len(order) != len(nodes):
+            raise ValueError("Recipes contain a cycle")
+        return order
+
+    def _resolve(self, node):
+        """
+        Computes one node's cost and route from its price and its ingredients' memoized costs.
+
+        A recipe competes with buying only if all of its ingredients are priced. Otherwise its partial
+        cost, counting unpriced ingredients as 0 like price_data, is used only when nothing else is.
+        """
+        options = []
+        if node in self.prices:
+            options.append((self.prices[node], "Buy", True))
+        for recipe in self.recipes.get(node, []):
+            cost = sum(amount if ingredient == "Coins" else amount * self.costs[ingredient] for ingredient, amount in recipe.items())
+            complete = all(ingredient == "Coins" or self.complete[ingredient] for ingredient in recipe)
+            options.append((cost, "Craft" if complete else "Partial", complete))
+        if not options:
+            return 0, "Unpriced", False
+        return min(options, key=lambda option: (not option[2], option[0]))
+
+    def update(self, bazaar_cache):
+        """
+        Brings the costs up to date with a price snapshot. Not thread-safe; see apply.
+
+        Args:
+            bazaar_cache (Dict): A cache mapping item IDs to their bazaar prices.
+
+        Returns:
+            set: The nodes whose cost changed. Every node on the first call.
+        """
+        prices = {node: bazaar_cache[node]['Instant Sell'] for node in self.rank if node in bazaar_cache}
+        if not self.costs:
+            dirty = set(self.order)
+        else:
+            dirty = {node for node in self.rank if prices.get(node) != self.prices.get(node)}
+        self.prices = prices
+
+        #Ingredients always rank before the recipes using them, so popping by rank resolves each node once
+        queue = [self.rank[node] for node in dirty]
+        heapq.heapify(queue)
+        queued = set(queue)
+        changed = set()
+        while queue:
+            node = self.order[heapq.heappop(queue)]
+            cost, route, complete = self._resolve(node)
+            self.routes[node] = route
+            if self.costs.get(node) != cost or self.complete.get(node) != complete:
+                self.costs[node] = cost
+                self.complete[node] = complete
+                changed.add(node)
+                for user in self.users.get(node, ()):
+                    if self.rank[user] not in queued:
+                        queued.add(self.rank[user])
+                        heapq.heappush(queue, self.rank[user])
+        return changed
+
+    def cost(self, node):
+        """
+        Returns the cheapest cost of a node after update. Nodes outside the graph cost 0.
+        """
+        return self.costs.get(node, 0)
+
+    def plan(self, node, amount=1):
+        """
+        Expands a node's cheapest route into what to buy.
+
+        Args:
+            node (str): An item ID.
+            amount (float): How many to obtain.
+
+        Returns:
+            Dict: Quantities to buy by item ID, plus 'Coins' spent directly. Unpriced items are listed too.
+        """
+        purchases = {}
+        def expand(node, amount):
+            if node == "Coins":
+                purchases["Coins"] = purchases.get("Coins", 0) + amount
+            elif self.routes.get(node) not in ("Craft", "Partial"):
+                purchases[node] = purchases.get(node, 0) + amount
+            else:
+                recipe = min(self.recipes[node], key=lambda recipe: (
+                    not all(ingredient == "Coins" or self.complete[ingredient] for ingredient in recipe),
+                    sum(quantity if ingredient == "Coins" else quantity * self.costs[ingredient] for ingredient, quantity in recipe.items())))
+                for ingredient, quantity in recipe.items():
+                    expand(ingredient, amount * quantity)
+        expand(node, amount)
+        return purchases
+
+    def apply(self, bazaar_cache):
+        """
+        Updates the costs and returns a bazaar cache whose Instant Sell prices are the cheapest costs.
+        Safe to call from several threads.
+
+        Every cost in the calculator is a sum of Instant Sell prices, so pricing with this cache accounts
+        for crafting wherever it is cheaper. Instant Buy prices, used for selling drops, are unchanged.
+
+        Args:
+            bazaar_cache (Dict): A cache mapping item IDs to their bazaar prices.
+
+        Returns:
+            Dict: A new bazaar cache. Craftable items missing from the bazaar are added with their craft cost.
+        """
+        with self._lock:
+            self.update(bazaar_cache)
+            resolved = dict(bazaar_cache)
+            for node, route in self.routes.items():
+                if route in ("Craft", "Partial"):
+                    resolved[node] = {**bazaar_cache.get(node, {"Instant Buy": 0}), "Instant Sell": self.costs[node]}
+        return resolved
+
+@functools.lru_cache(maxsize=1)
+def get_resolver():
+    """
+    Returns the process-wide resolver for the data files, so its memo carries over between price snapshots.
+
+    Returns:
+        RecipeResolver: The shared resolver.
+    """
+    return RecipeResolver(build_recipes(*load_data()))
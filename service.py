@@ -0,0 +1,488 @@
+"""
+Serves setup queries from one warm in-memory engine, as a CLI or a local HTTP API:
+
+    python service.py query --minion-whitelist "Clay Minion" --misc-upgrades Beacon --view top --by ROI
+    python service.py serve --port 8000
+
+    python service.py simulate --minion-whitelist "Clay Minion" --view top --horizon 7 --samples 2000
+    python service.py sensitivity --view top --k 20
+
+The HTTP API answers GET /query with the same criteria as query string parameters (repeat a parameter
+for several names), POST /query with a JSON object, and GET /options with the valid names. /simulate takes
+the same criteria plus horizon, samples and seed, and adds each row's simulated daily profit percentiles.
+/sensitivity takes the same criteria as /query and adds each row's nearest break-even price.
+"""
+import sys
+import math
+import json
+import time
+import argparse
+import threading
+import pandas as pd
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from functions import create_all_combos
+from engine import reprice, add_misc_flags, combo_effects, misc_mask, misc_combo, simulate, sensitivity, MISC_UPGRADES
+from prices import get_provider
+from bundle import load_structure
+from query import SetupTable, ResultCache, RANKINGS, query_key
+from instrument import BuildTrace
+from recipes import get_resolver
+
+COLUMNS = ['Minion', 'Tier', 'Fuel', 'Upgrade 1', 'Upgrade 2', 'Profit', 'Cost', 'ROI']
+LIST_CRITERIA = ['minion_whitelist', 'minion_blacklist', 'fuel_whitelist', 'fuel_blacklist',
+                 'upgrade_whitelist', 'upgrade_blacklist', 'misc_upgrades']
+NUMBER_CRITERIA = ['tier_min', 'tier_max', 'cost_min', 'cost_max', 'k', 'limit']
+SIMULATE_CRITERIA = ['horizon', 'samples', 'seed']
+SIMULATE_COLUMNS = ['Expected', 'P5', 'P50', 'P95']
+SENSITIVITY_COLUMNS = ['Break Even Item', 'Break Even Price', 'Break Even', 'Margin']
+MAX_SAMPLES = 10000
+MAX_TIER = 127
+VIEWS = ["all", "top", "pareto"]
+DEFAULT_LIMIT = 1000
+
+def build_table(craft_costs=False, memory=None):
+    """
+    Builds the query table from current prices, tracing each stage.
+
+    Args:
+        craft_costs (bool): Price recipe ingredients at the cheaper of buying and crafting them,
+            see recipes.RecipeResolver.apply. Otherwise every ingredient is bought.
+        memory (bool, optional): Trace each stage's peak memory. Defaults to trace_memory(), which is off
+            unless TRACE_MEMORY is set.
+
+    Returns:
+        Tuple of the SetupTable, its finished BuildTrace and the prices it was built from: a dictionary with
+            the 'Bazaar' cache, after recipe resolution if craft_costs, and the 'Postcard' cost.
+    """
+    with BuildTrace("create_final_df", memory=memory) as trace:
+        with trace.stage("Fetch Prices") as stage:
+            prices = get_provider().fetch()
+            bazaar_cache = prices['Bazaar']
+            stage['Rows'] = len(bazaar_cache)
+        for name, seconds in prices['Seconds'].items():
+            trace.add(f"Fetch {name}", seconds)
+
+        if craft_costs:
+            with trace.stage("Resolve Recipes") as stage:
+                bazaar_cache = get_resolver().apply(bazaar_cache)
+                stage['Rows'] = len(bazaar_cache)
+
+        with trace.stage("Misc Combos") as stage:
+            all_combos = create_all_combos(bazaar_cache, prices['Postcard'])
+            stage['Rows'] = len(all_combos)
+
+        with trace.stage("Load Structure") as stage:
+            structure = load_structure()
+            stage['Rows'] = len(structure['Rows']['Combo'])
+
+        with trace.stage("Reprice") as stage:
+            base_df = reprice(structure, bazaar_cache)
+            stage['Rows'] = len(base_df)
+
+        with trace.stage("Misc Flags"):
+            base_df = add_misc_flags(base_df, structure['Minion Info'])
+
+        with trace.stage("Index") as stage:
+            table = SetupTable(base_df, combo_effects(all_combos))
+            stage['Rows'] = len(table)
+
+    return table, trace, {"Bazaar": bazaar_cache, "Postcard": prices['Postcard']}
+
+def parse_criteria(criteria, simulation=False):
+    """
+    Validates query criteria from JSON or a parsed query string.
+
+    Args:
+        criteria (Dict): Any of LIST_CRITERIA (name lists), NUMBER_CRITERIA, 'view' (one of VIEWS) and
+            'by' ('Profit', 'ROI' or 'Cost'). Query string values arrive as lists and are unwrapped.
+        simulation (bool): Also accept SIMULATE_CRITERIA, see QueryService.simulate.
+
+    Returns:
+        Dict: The criteria with defaults filled in.
+
+    Raises:
+        ValueError: For unknown keys, names that aren't misc upgrades, or malformed values: list criteria
+            that aren't names, number criteria that aren't finite numbers, tiers outside 0 to MAX_TIER, a k
+            below 1, a negative limit, or a view or ranking that isn't one of the allowed strings.
+    """
+    numbers = NUMBER_CRITERIA + (SIMULATE_CRITERIA if simulation else [])
+    unknown = set(criteria) - set(LIST_CRITERIA) - set(numbers) - {'view', 'by'}
+    if unknown:
+        raise ValueError(f"Unknown criteria: {', '.join(sorted(unknown))}")
+
+    parsed = {}
+    for key in LIST_CRITERIA:
+        value = criteria.get(key)
+        value = [] if value is None else [value] if isinstance(value, str) else value
+        if not isinstance(value, (list, tuple)) or not all(isinstance(name, str) for name in value):
+            raise ValueError(f"{key} must be a name or a list of names")
+        parsed[key] = list(value)
+    for key in numbers:
+        value = criteria.get(key)
+        if isinstance(value, list):
+            value = value[-1] if value else None
+        if value is None or value == "":
+            parsed[key] = None
+            continue
+        #bool is an int subclass, but true/false isn't a meaningful bound
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise ValueError(f"{key} must be a number")
+        try:
+            number = float(value)
+        except (ValueError, OverflowError):
+            raise ValueError(f"{key} must be a number") from None
+        if not math.isfinite(number):
+            raise ValueError(f"{key} must be a finite number")
+        parsed[key] = number
+    for key, default, allowed in [('view', "all", VIEWS), ('by', "Profit", list(RANKINGS))]:
+        value = criteria.get(key, default)
+        value = value[-1] if isinstance(value, list) and value else value
+        if not isinstance(value, str) or value not in allowed:
+            raise ValueError(f"{key} must be one of {', '.join(allowed)}")
+        parsed[key] = value
+
+    for key in ['tier_min', 'tier_max']:
+        if parsed[key] is not None and not 0 <= parsed[key] <= MAX_TIER:
+            raise ValueError(f"{key} must be between 0 and {MAX_TIER}")
+    if parsed['k'] is not None and parsed['k'] < 1:
+        raise ValueError("k must be at least 1")
+    if parsed['limit'] is not None and parsed['limit'] < 0:
+        raise ValueError("limit can't be negative")
+
+    invalid = [name for name in parsed['misc_upgrades'] if name not in MISC_UPGRADES]
+    if invalid:
+        raise ValueError(f"Unknown misc upgrades: {', '.join(invalid)}")
+    return parsed
+
+class QueryService:
+    """
+    Keeps one SetupTable warm and answers filter, top-K and Pareto queries from it.
+
+    The table is rebuilt when it is older than max_age, under a lock so concurrent requests share one rebuild.
+    Matching rows are cached per query until the next rebuild.
+
+    Args:
+        max_age (float): Seconds before the table is rebuilt from fresh prices.
+        craft_costs (bool): See build_table.
+        cache_size (int): Most query results cached.
+    """
+    def __init__(self, max_age=3600, craft_costs=False, cache_size=256):
+        self.max_age = max_age
+        self.craft_costs = craft_costs
+        self.cache = ResultCache(cache_size)
+        self._lock = threading.Lock()
+        self._table = None
+        self._prices = None
+        self.built = 0
+        self.report = None
+
+    def current(self):
+        """
+        Returns the current table and the prices it was built from, rebuilding both first if they are
+        missing or too old.
+
+        Returns:
+            Tuple of the SetupTable and its prices, see build_table.
+        """
+        with self._lock:
+            if self._table is None or time.time() - self.built >= self.max_age:
+                self._table, trace, self._prices = build_table(self.craft_costs)
+                self.built = time.time()
+                self.report = trace.report()
+            return self._table, self._prices
+
+    def table(self):
+        """Returns the current table, see current."""
+        return self.current()[0]
+
+    def options(self):
+        """
+        Returns the valid names for each criterion.
+
+        Returns:
+            Dict: 'Minions', 'Fuels', 'Upgrades' and 'Misc Upgrades' name lists.
+        """
+        df = self.table().df
+        return {
+            "Minions": list(df['Minion'].cat.categories),
+            "Fuels": list(df['Fuel'].cat.categories),
+            "Upgrades": list(df['Upgrade 1'].cat.categories),
+            "Misc Upgrades": MISC_UPGRADES
+        }
+
+    def _select(self, table, criteria):
+        """Finds the rows of a table for parsed criteria. Returns the matched count and the selected rows."""
+        if misc_mask(criteria['misc_upgrades']) not in table.effects.index:
+            raise ValueError("These misc upgrades can't be combined")
+
+        tier_range = None
+        if criteria['tier_min'] is not None or criteria['tier_max'] is not None:
+            tier_range = (int(criteria['tier_min'] or 0), int(criteria['tier_max'] if criteria['tier_max'] is not None else MAX_TIER))
+        cost_range = None
+        if criteria['cost_min'] is not None or criteria['cost_max'] is not None:
+            cost_range = (criteria['cost_min'] or 0, criteria['cost_max'] if criteria['cost_max'] is not None else float("inf"))
+
+        misc_upgrades = criteria['misc_upgrades']
+        filters = {
+            "minion_whitelist": criteria['minion_whitelist'],
+            "minion_blacklist": criteria['minion_blacklist'],
+            "tier_range": tier_range,
+            "fuel_whitelist": criteria['fuel_whitelist'],
+            "fuel_blacklist": criteria['fuel_blacklist'],
+            "upgrade_whitelist": criteria['upgrade_whitelist'],
+            "upgrade_blacklist": criteria['upgrade_blacklist'],
+            "cost_range": cost_range,
+            "misc_upgrades": misc_upgrades
+        }
+        k = 10 if criteria['k'] is None else int(criteria['k'])
+        rows = self.cache.get_or_compute(table.generation, query_key(**filters), lambda: table.filter(**filters))
+        matched = len(rows)
+        if criteria['view'] != "all":
+            key = query_key(**filters, view=criteria['view'], by=criteria['by'], k=k)
+            if criteria['view'] == "top":
+                rows = self.cache.get_or_compute(table.generation, key, lambda: table.top_k(rows, k, criteria['by'], misc_upgrades))
+            else:
+                rows = self.cache.get_or_compute(table.generation, key, lambda: table.pareto(rows, misc_upgrades))
+
+        limit = DEFAULT_LIMIT if criteria['limit'] is None else int(criteria['limit'])
+        if limit > 0:
+            rows = rows[:limit]
+        return matched, rows
+
+    def query(self, criteria):
+        """
+        Answers one query.
+
+        Args:
+            criteria (Dict): See parse_criteria. 'view' picks all matching rows, the top 'k' by 'by',
+                or the Pareto frontier; 'limit' caps the rows returned (0 for no cap).
+
+        Raises:
+            ValueError: For invalid criteria or a misc upgrade combo that can't be built.
+
+        Returns:
+            Dict: 'Matched' (rows passing the filters), 'Misc Upgrades' (the applied combo, sorted),
+                'Built' (table timestamp) and 'Rows' (a DataFrame of COLUMNS).
+        """
+        criteria = parse_criteria(criteria)
+        table = self.table()
+        matched, rows = self._select(table, criteria)
+        return {
+            "Matched": matched,
+            "Misc Upgrades": list(misc_combo(misc_mask(criteria['misc_upgrades']))),
+            "Built": self.built,
+            "Rows": table.evaluate(rows, criteria['misc_upgrades'])[COLUMNS].reset_index(drop=True)
+        }
+
+    def simulate(self, criteria):
+        """
+        Answers one query and simulates how the returned setups' daily profit spreads, see engine.simulate.
+
+        The simulation prices the setups with the same prices the table was built from.
+
+        Args:
+            criteria (Dict): See query, plus 'horizon' (days averaged over, default 1), 'samples' (simulated
+                horizons per setup, default 1000, at most MAX_SAMPLES) and 'seed' (default 0).
+
+        Raises:
+            ValueError: For invalid criteria or a misc upgrade combo that can't be built.
+
+        Returns:
+            Dict: As query, with 'Horizon', 'Samples' and 'Seed', and SIMULATE_COLUMNS added to 'Rows'.
+        """
+        criteria = parse_criteria(criteria, simulation=True)
+        horizon = 1 if criteria['horizon'] is None else criteria['horizon']
+        samples = 1000 if criteria['samples'] is None else int(criteria['samples'])
+        seed = 0 if criteria['seed'] is None else int(criteria['seed'])
+        if horizon <= 0:
+            raise ValueError("horizon must be positive")
+        if not 1 <= samples <= MAX_SAMPLES:
+            raise ValueError(f"samples must be between 1 and {MAX_SAMPLES}")
+        if seed < 0:
+            raise ValueError("seed can't be negative")
+
+        table, prices = self.current()
+        matched, rows = self._select(table, criteria)
+        spread = simulate(load_structure(), prices['Bazaar'], prices['Postcard'], rows, criteria['misc_upgrades'], horizon, samples, seed)
+        rows_df = table.evaluate(rows, criteria['misc_upgrades'])[COLUMNS].reset_index(drop=True)
+        return {
+            "Matched": matched,
+            "Misc Upgrades": list(misc_combo(misc_mask(criteria['misc_upgrades']))),
+            "Built": self.built,
+            "Horizon": horizon,
+            "Samples": samples,
+            "Seed": seed,
+            "Rows": pd.concat([rows_df, spread[SIMULATE_COLUMNS].reset_index(drop=True)], axis=1)
+        }
+
+    def sensitivity(self, criteria):
+        """
+        Answers one query and finds how close each returned setup is to losing money, see engine.sensitivity.
+
+        The setups are priced with the same prices the table was built from.
+
+        Args:
+            criteria (Dict): See query.
+
+        Raises:
+            ValueError: For invalid criteria or a misc upgrade combo that can't be built.
+
+        Returns:
+            Dict: As query, with SENSITIVITY_COLUMNS added to 'Rows': the price whose move reaches break-even
+                soonest, as 'Break Even Item' and 'Break Even Price' ('Instant Buy' or 'Instant Sell'), its
+                'Break Even' value and the relative move it takes as 'Margin'. Empty where no price does.
+        """
+        criteria = parse_criteria(criteria)
+        table, prices = self.current()
+        matched, rows = self._select(table, criteria)
+        summary = sensitivity(load_structure(), prices['Bazaar'], prices['Postcard'], rows, criteria['misc_upgrades'])['Summary']
+        rows_df = table.evaluate(rows, criteria['misc_upgrades'])[COLUMNS].reset_index(drop=True)
+        return {
+            "Matched": matched,
+            "Misc Upgrades": list(misc_combo(misc_mask(criteria['misc_upgrades']))),
+            "Built": self.built,
+            "Rows": pd.concat([rows_df, summary[SENSITIVITY_COLUMNS].reset_index(drop=True)], axis=1)
+        }
+
+def to_json(result):
+    """Serializes a query result, with its rows as a list of records."""
+    rows = result['Rows'].astype({column: str for column in ['Minion', 'Fuel', 'Upgrade 1', 'Upgrade 2']})
+    body = {key: value for key, value in result.items() if key != 'Rows'}
+    body['Rows'] = json.loads(rows.to_json(orient="records", double_precision=10))
+    return json.dumps(body)
+
+def make_handler(service):
+    """
+    Creates a request handler class bound to a QueryService.
+
+    Args:
+        service (QueryService): The warm service to answer from.
+
+    Returns:
+        type: A BaseHTTPRequestHandler subclass.
+    """
+    answers = {"/query": service.query, "/simulate": service.simulate, "/sensitivity": service.sensitivity}
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, body):
+            payload = body.encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _answer(self, answer, criteria):
+            try:
+                self._send(200, to_json(answer(criteria)))
+            except (ValueError, TypeError, OverflowError) as error:
+                self._send(400, json.dumps({"Error": str(error)}))
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path in answers:
+                self._answer(answers[url.path], parse_qs(url.query))
+            elif url.path == "/options":
+                self._send(200, json.dumps(service.options()))
+            elif url.path == "/health":
+                service.table()
+                self._send(200, json.dumps({"Built": service.built, "Build": service.report, "Cache": service.cache.stats()}))
+            else:
+                self._send(404, json.dumps({"Error": "Not found"}))
+
+        def do_POST(self):
+            path = urlparse(self.path).path
+            if path not in answers:
+                self._send(404, json.dumps({"Error": "Not found"}))
+                return
+            try:
+                criteria = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            except ValueError:
+                self._send(400, json.dumps({"Error": "Body must be a JSON object"}))
+                return
+            if not isinstance(criteria, dict):
+                self._send(400, json.dumps({"Error": "Body must be a JSON object"}))
+                return
+            self._answer(answers[path], criteria)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+def serve(host="127.0.0.1", port=8000, max_age=3600, craft_costs=False):
+    """
+    Builds the table and serves the HTTP API until interrupted.
+
+    Args:
+        host (str): Interface to bind; keep the default to serve this machine only.
+        port (int): Port to listen on.
+        max_age, craft_costs: See QueryService.
+    """
+    service = QueryService(max_age, craft_costs)
+    service.table()
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    print(f"Serving on http://{host}:{server.server_address[1]}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Queries minion setups from a warm engine.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    query = commands.add_parser("query", help="Answer one query and print the rows.")
+    simulation = commands.add_parser("simulate", help="Answer one query and simulate the rows' daily profit spread.")
+    fragility = commands.add_parser("sensitivity", help="Answer one query and find each row's nearest break-even price.")
+    for command in (query, simulation, fragility):
+        for key in LIST_CRITERIA:
+            command.add_argument("--" + key.replace("_", "-"), nargs="+", default=[], metavar="NAME")
+        for key in NUMBER_CRITERIA:
+            command.add_argument("--" + key.replace("_", "-"), type=float)
+        command.add_argument("--view", choices=VIEWS, default="all")
+        command.add_argument("--by", choices=list(RANKINGS), default="Profit")
+        command.add_argument("--format", choices=["table", "csv", "json"], default="table")
+    simulation.add_argument("--horizon", type=float, default=1, help="Days averaged over.")
+    simulation.add_argument("--samples", type=int, default=1000, help="Simulated horizons per setup.")
+    simulation.add_argument("--seed", type=int, default=0)
+
+    server = commands.add_parser("serve", help="Serve the HTTP API.")
+    server.add_argument("--host", default="127.0.0.1")
+    server.add_argument("--port", type=int, default=8000)
+    server.add_argument("--max-age", type=float, default=3600)
+
+    for command in (query, simulation, fragility, server):
+        command.add_argument("--craft-costs", action="store_true", help="Craft ingredients when cheaper than buying them.")
+
+    args = parser.parse_args(argv)
+    if args.command == "serve":
+        serve(args.host, args.port, args.max_age, args.craft_costs)
+        return 0
+
+    criteria = {key: getattr(args, key) for key in LIST_CRITERIA + NUMBER_CRITERIA + ['view', 'by']}
+    service = QueryService(craft_costs=args.craft_costs)
+    try:
+        if args.command == "simulate":
+            result = service.simulate({**criteria, "horizon": args.horizon, "samples": args.samples, "seed": args.seed})
+        elif args.command == "sensitivity":
+            result = service.sensitivity(criteria)
+        else:
+            result = service.query(criteria)
+    except ValueError as error:
+        parser.error(str(error))
+    if args.format == "json":
+        print(to_json(result))
+    elif args.format == "csv":
+        result['Rows'].to_csv(sys.stdout, index=False)
+    else:
+        print(f"{result['Matched']:,} matching setups, misc upgrades: {', '.join(result['Misc Upgrades']) or 'none'}")
+        print(result['Rows'].to_string(index=False))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,30 @@
+import os
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+@pytest.fixture(scope="session", autouse=True)
+def repo_root():
+    #load_data reads the data files relative to the working directory
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(ROOT)
+        yield
+
+@pytest.fixture(scope="session")
+def structure(repo_root):
+    from functions import load_data
+    from engine import build_structure
+    return build_structure(*load_data())
+
+@pytest.fixture(scope="session")
+def table(structure):
+    """A SetupTable priced from the frozen benchmark fixture."""
+    from functions import create_all_combos
+    from engine import reprice, add_misc_flags, combo_effects
+    from query import SetupTable
+    from benchmarks.catalog import load_fixture
+    bazaar, postcard = load_fixture()
+    base_df = add_misc_flags(reprice(structure, bazaar), structure['Minion Info'])
+    return SetupTable(base_df, combo_effects(create_all_combos(bazaar, postcard)))
@@ -0,0 +1,70 @@
+import copy
+import pytest
+import numpy as np
+import pandas as pd
+
+from functions import load_data, price_data
+from engine import check_parity, simulate, sensitivity
+from benchmarks.catalog import load_fixture
+
+@pytest.fixture(scope="module")
+def catalog():
+    """The fixture bazaar prices and the data files priced from them."""
+    bazaar, postcard = load_fixture()
+    minions, fuels, upgrades = copy.deepcopy(load_data())
+    price_data(minions, fuels, upgrades, bazaar)
+    return minions, fuels, upgrades, bazaar, postcard
+
+def test_batched_engine_matches_dict_engine(catalog):
+    minions, fuels, upgrades, bazaar, _ = catalog
+    mismatches = check_parity(minions, fuels, upgrades, bazaar)
+    assert mismatches.empty, mismatches.head().to_string()
+
+def test_simulate_is_reproducible(catalog, structure):
+    _, _, _, bazaar, postcard = catalog
+    rows = np.arange(0, len(structure['Rows']['Combo']), 97)
+    first = simulate(structure, bazaar, postcard, rows, ("Beacon",), horizon=7, samples=200, seed=1, memory_mb=4)
+    second = simulate(structure, bazaar, postcard, rows, ("Beacon",), horizon=7, samples=200, seed=1, memory_mb=4)
+    pd.testing.assert_frame_equal(first, second)
+
+def test_simulate_expected_ignores_memory_budget(catalog, structure):
+    _, _, _, bazaar, postcard = catalog
+    rows = np.arange(0, len(structure['Rows']['Combo']), 97)
+    large = simulate(structure, bazaar, postcard, rows, horizon=1, samples=50, memory_mb=64)
+    tiny = simulate(structure, bazaar, postcard, rows, horizon=1, samples=50, memory_mb=0.001)
+    pd.testing.assert_series_equal(large['Expected'], tiny['Expected'])
+    assert (tiny['P5'] <= tiny['P50']).all() and (tiny['P50'] <= tiny['P95']).all()
+
+def test_simulate_median_converges_to_expected(catalog, structure):
+    _, _, _, bazaar, postcard = catalog
+    rows = np.arange(0, len(structure['Rows']['Combo']), 97)
+    result = simulate(structure, bazaar, postcard, rows, horizon=100, samples=200, seed=0)
+    result = result[result['Expected'].abs() > 1]
+    gap = ((result['P50'] - result['Expected']) / result['Expected']).abs()
+    assert gap.median() < 1e-3
+
+def moved_price(bazaar, item, field, value):
+    """A copy of a bazaar cache with one price replaced."""
+    return {**bazaar, item: {"Instant Buy": 0, "Instant Sell": 0, **bazaar.get(item, {}), field: value}}
+
+def test_sensitivity_matches_finite_differences(catalog, structure):
+    _, _, _, bazaar, postcard = catalog
+    rows = np.arange(0, len(structure['Rows']['Combo']), 211)
+    misc_upgrades = ("Beacon", "Mithril Infusion")
+    result = sensitivity(structure, bazaar, postcard, rows, misc_upgrades)
+    base = result['Summary']['Profit']
+    for entry in result['Sensitivity'].sample(40, random_state=0).itertuples():
+        step = max(abs(entry.Value) * 1e-3, 1)
+        moved = moved_price(bazaar, entry.Item, entry.Price, entry.Value + step)
+        profit = sensitivity(structure, moved, postcard, [entry.Row], misc_upgrades)['Summary']['Profit'].iloc[0]
+        assert (profit - base[entry.Row]) / step == pytest.approx(entry.dProfit, rel=1e-6, abs=1e-6)
+
+def test_break_even_price_zeroes_profit(catalog, structure):
+    _, _, _, bazaar, postcard = catalog
+    rows = np.arange(0, len(structure['Rows']['Combo']), 211)
+    summary = sensitivity(structure, bazaar, postcard, rows)['Summary'].dropna(subset=['Break Even'])
+    assert len(summary) > 10
+    for row, setup in summary.sample(30, random_state=0).iterrows():
+        moved = moved_price(bazaar, setup['Break Even Item'], setup['Break Even Price'], setup['Break Even'])
+        profit = sensitivity(structure, moved, postcard, [row])['Summary']['Profit'].iloc[0]
+        assert profit == pytest.approx(0, abs=1e-6 * abs(setup['Profit']) + 1e-6)
@@ -0,0 +1,74 @@
+import os
+import numpy as np
+
+from functions import create_all_combos
+from engine import reprice, add_misc_flags, combo_effects, combo_values, misc_mask, replay
+from history import PriceHistory, FIELDS
+from benchmarks.catalog import load_fixture
+
+def snapshots(count, seed=0):
+    """Fixture prices with a random share of items repriced per snapshot."""
+    bazaar, postcard = load_fixture()
+    rng = np.random.default_rng(seed)
+    result = []
+    for i in range(count):
+        moved = {
+            item: {field: price * rng.uniform(0.8, 1.25) for field, price in prices.items()}
+            for item, prices in bazaar.items() if rng.random() < 0.3
+        }
+        result.append(({**bazaar, **moved}, postcard * (1 + i / 10)))
+    return result
+
+def test_append_skips_duplicates_and_aligns_new_items(tmp_path):
+    history = PriceHistory(str(tmp_path))
+    first = {"A": {"Instant Buy": 2, "Instant Sell": 1}, "B": {"Instant Buy": 4, "Instant Sell": 3}}
+    assert history.append(first, 100, 5)
+    assert not history.append(first, 100, 6)
+    assert not history.append(first, 200, 5)
+    second = {**first, "C": {"Instant Buy": 6, "Instant Sell": 5}}
+    assert history.append(second, 300, 5)
+    assert len(history) == 2 and history.last_fetched() == 300
+
+    loaded = history.load(["C", "A", "D"])
+    np.testing.assert_array_equal(loaded['Fetched'], [100, 300])
+    np.testing.assert_array_equal(loaded['Instant Buy'], [[0, 2, 0], [6, 2, 0]])
+    np.testing.assert_array_equal(loaded['Instant Sell'], [[0, 1, 0], [5, 1, 0]])
+    assert len(history.load(["A"], start=150)['Fetched']) == 1
+
+def test_append_recovers_from_torn_write(tmp_path):
+    history = PriceHistory(str(tmp_path))
+    bazaar = {"A": {"Instant Buy": 2, "Instant Sell": 1}, "B": {"Instant Buy": 4, "Instant Sell": 3}}
+    history.append(bazaar, 100, 5)
+    #A crash after the price rows but before the timestamp leaves partial rows in some fields
+    segment = os.path.join(str(tmp_path), history._segments()[-1])
+    with open(os.path.join(segment, FIELDS['Instant Buy']), "ab") as file:
+        file.write(b"\xff" * 12)
+    assert len(history) == 1
+
+    moved = {**bazaar, "A": {"Instant Buy": 7, "Instant Sell": 6}}
+    assert history.append(moved, 200, 5)
+    loaded = history.load(["A", "B"])
+    np.testing.assert_array_equal(loaded['Instant Buy'], [[2, 4], [7, 4]])
+    np.testing.assert_array_equal(loaded['Instant Sell'], [[1, 3], [6, 3]])
+    assert os.path.getsize(os.path.join(segment, FIELDS['Instant Buy'])) == 2 * 2 * 8
+
+def test_replay_matches_reprice(tmp_path, structure):
+    history = PriceHistory(str(tmp_path))
+    priced = snapshots(4)
+    for i, (bazaar, postcard) in enumerate(priced):
+        assert history.append(bazaar, 1000 + i, postcard)
+    rows = np.arange(0, len(structure['Rows']['Combo']), 53)
+    misc_upgrades = ("Beacon", "Floating Crystal")
+    result = replay(structure, rows, history, misc_upgrades)
+    assert len(result['Profit']) == len(priced)
+
+    for i, (bazaar, postcard) in enumerate(priced):
+        #The 64-bit frame keeps the comparison exact; the flags need the compact frame's categoricals
+        flags = add_misc_flags(reprice(structure, bazaar), structure['Minion Info'])
+        base_df = reprice(structure, bazaar, compact=False).assign(**{
+            column: flags[column].to_numpy() for column in ['Crystal Penalty', 'Mob Penalty']
+        })
+        effects = combo_effects(create_all_combos(bazaar, postcard))
+        expected = combo_values(base_df.iloc[rows], misc_mask(misc_upgrades), effects)
+        np.testing.assert_allclose(result['Profit'].iloc[i].to_numpy(), expected['Profit'], rtol=1e-9, atol=1e-6)
+        np.testing.assert_allclose(result['Cost'].iloc[i].to_numpy(), expected['Cost'], rtol=1e-9, atol=1e-6)
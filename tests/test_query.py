@@ -0,0 +1,135 @@
+import time
+import numpy as np
+import pandas as pd
+
+from engine import MISC_UPGRADES, misc_mask
+from query import ResultCache, frontier, query_key, sorted_frontier
+from portfolio import optimize
+
+def reference_filter(df, minion_whitelist, minion_blacklist, tier_range, fuel_whitelist, fuel_blacklist,
+                     upgrade_whitelist, upgrade_blacklist, cost_range):
+    """The app's original pandas mask over an evaluated frame."""
+    mask = pd.Series(True, index=df.index)
+    if tier_range:
+        mask &= df['Tier'].between(*tier_range)
+    if minion_whitelist:
+        mask &= df['Minion'].isin(minion_whitelist)
+    if minion_blacklist:
+        mask &= ~df['Minion'].isin(minion_blacklist)
+    if fuel_whitelist:
+        mask &= df['Fuel'].isin(fuel_whitelist)
+    if fuel_blacklist:
+        mask &= ~df['Fuel'].isin(fuel_blacklist)
+    if upgrade_whitelist:
+        if len(upgrade_whitelist) == 1:
+            mask &= df['Upgrade 1'].isin(upgrade_whitelist) | df['Upgrade 2'].isin(upgrade_whitelist)
+        else:
+            mask &= df['Upgrade 1'].isin(upgrade_whitelist) & df['Upgrade 2'].isin(upgrade_whitelist)
+    if upgrade_blacklist:
+        mask &= ~(df['Upgrade 1'].isin(upgrade_blacklist) | df['Upgrade 2'].isin(upgrade_blacklist))
+    if cost_range:
+        mask &= (df['Cost'] >= cost_range[0]) & (df['Cost'] <= cost_range[1])
+    return np.flatnonzero(mask.to_numpy())
+
+def test_filter_matches_pandas_mask(table):
+    rng = np.random.default_rng(0)
+    minions = list(table.df['Minion'].cat.categories)
+    fuels = list(table.df['Fuel'].cat.categories)
+    upgrades = list(table.df['Upgrade 1'].cat.categories)
+    frames = {}
+    def pick(names, chance):
+        if rng.random() > chance:
+            return []
+        return list(rng.choice(names, int(rng.integers(1, 4)), replace=False))
+
+    for _ in range(300):
+        misc_upgrades = [name for name in MISC_UPGRADES if rng.random() < 0.3]
+        criteria = {
+            "minion_whitelist": pick(minions, 0.4),
+            "minion_blacklist": pick(minions, 0.3),
+            "tier_range": tuple(sorted(rng.integers(0, 14, 2))) if rng.random() < 0.4 else None,
+            "fuel_whitelist": pick(fuels, 0.3),
+            "fuel_blacklist": pick(fuels, 0.3),
+            "upgrade_whitelist": pick(upgrades, 0.3),
+            "upgrade_blacklist": pick(upgrades, 0.3),
+            "cost_range": None
+        }
+        rows = table.filter(**criteria, misc_upgrades=misc_upgrades)
+        mask = misc_mask(misc_upgrades)
+        if mask not in table.effects.index:
+            assert len(rows) == 0
+            continue
+        if mask not in frames:
+            frames[mask] = table.evaluate(np.arange(len(table)), misc_upgrades).reset_index(drop=True)
+        df = frames[mask]
+        if rng.random() < 0.5:
+            #Bounds taken from real costs, so rows sit exactly on them
+            criteria['cost_range'] = tuple(sorted(df['Cost'].iloc[rng.integers(0, len(df), 2)]))
+        rows = table.filter(**criteria, misc_upgrades=misc_upgrades)
+        np.testing.assert_array_equal(rows, reference_filter(df, **criteria))
+
+def test_sorted_frontier_matches_frontier():
+    rng = np.random.default_rng(0)
+    for _ in range(500):
+        n = int(rng.integers(1, 40))
+        cost = rng.integers(0, 6, n).astype(float)
+        profit = rng.integers(-3, 4, n).astype(float)
+        order = np.argsort(cost, kind='stable')
+        expected = [(cost[i], profit[i]) for i in frontier(cost, profit)]
+        assert [(cost[order][i], profit[order][i]) for i in sorted_frontier(cost[order], profit[order])] == expected
+
+def test_pareto_is_undominated(table):
+    rows = np.arange(len(table))
+    values = table.values(table.pareto(rows, ["Beacon"]), ["Beacon"])
+    everything = table.values(rows, ["Beacon"])
+    assert np.all(np.diff(values['Cost']) > 0) and np.all(np.diff(values['Profit']) > 0)
+    for cost, profit in zip(values['Cost'], values['Profit']):
+        assert not np.any((everything['Cost'] <= cost) & (everything['Profit'] > profit))
+
+def test_optimize_many_slots_is_fast(table):
+    rows = np.arange(len(table))
+    optimize(table, rows, 1, 1e9)
+    for slots in (25, 30):
+        start = time.perf_counter()
+        result = optimize(table, rows, slots, 1e9)
+        assert time.perf_counter() - start < 1.5
+        assert result['Setups']['Count'].sum() <= slots
+
+def test_result_cache_evicts_least_recently_used():
+    cache = ResultCache(maxsize=2)
+    cache.put("a", 1, np.arange(1))
+    cache.put("a", 2, np.arange(2))
+    assert cache.get("a", 1) is not None
+    cache.put("a", 3, np.arange(3))
+    assert cache.get("a", 2) is None
+    assert len(cache.get("a", 1)) == 1 and len(cache.get("a", 3)) == 3
+    assert len(cache) == 2
+
+def test_result_cache_counts_and_computes_once():
+    cache = ResultCache()
+    calls = []
+    def compute():
+        calls.append(1)
+        return np.arange(5)
+    first = cache.get_or_compute("a", "key", compute)
+    second = cache.get_or_compute("a", "key", compute)
+    assert len(calls) == 1 and first is second
+    assert not first.flags.writeable
+    stats = cache.stats()
+    assert (stats['Hits'], stats['Misses'], stats['Size']) == (1, 1, 1)
+
+def test_result_cache_empties_on_new_generation():
+    cache = ResultCache()
+    cache.put("a", "key", np.arange(3))
+    assert cache.get("b", "key") is None
+    assert len(cache) == 0 and cache.stats()['Generation'] == "b"
+    assert cache.get("a", "key") is None
+
+def test_query_key_is_canonical():
+    first = query_key(minion_whitelist=["Snow Minion", "Clay Minion", "Clay Minion"], cost_range=(0, 5),
+                      misc_upgrades=["Beacon", "Floating Crystal"], view="top", by="Profit", k=10)
+    second = query_key(minion_whitelist=("Clay Minion", "Snow Minion"), cost_range=(0.0, 5.0),
+                       misc_upgrades=("Floating Crystal", "Beacon"), view="top", by="Profit", k=10.0)
+    assert first == second
+    assert query_key(view="pareto", by="ROI", k=5) == query_key(view="pareto")
+    assert query_key(minion_whitelist=["Clay Minion"]) != query_key(minion_blacklist=["Clay Minion"])